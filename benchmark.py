@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import resource
+import multiprocessing
+from utils import computeBounds, import_arrays, cp_data, cp_heuristic
+from mip_model import FORMULATIONS, build_model, to_highs, to_pywraplp
+from smt import build_smt_model, build_smt2_model, build_successor_model, bisection
+from flatzinc_cache import compile_model, solve_flatzinc
+from main import models_gecode, models_chuffed, cp_parameters
+
+
+def measure(instance, formulation, conn):
+
+    num_couriers, num_items, courier_size, item_size, distances = import_arrays(f"Instances/inst{instance}.dat")
+    lb, ub = computeBounds(distances, num_couriers, num_items, courier_size, item_size)
+
+    start = time.time()
+    model = build_model(formulation, num_couriers, num_items, courier_size, item_size, distances, lb, ub)
+    build_time = time.time() - start
+
+    # Loading the model in a solver is part of the cost of building it: HiGHS through passModel,
+    # SCIP (OR-Tools) through the MPModelProto
+    start = time.time()
+    highs = to_highs(model)
+    load_time = time.time() - start
+    del highs
+
+    start = time.time()
+    solver = to_pywraplp(model, "SCIP")
+    pywraplp_time = time.time() - start
+    del solver
+
+    conn.send({
+        "cols": model["num_cols"],
+        "rows": model["num_rows"],
+        "nnz": len(model["a_value"]),
+        "build_time": build_time,
+        "load_time": load_time,
+        "pywraplp_time": pywraplp_time,
+        # Peak resident memory of the process, in MB
+        "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    })
+    conn.close()
+
+
+def measure_smt(instance, encoding, timelimit, conn):
+
+    num_couriers, num_items, courier_size, item_size, distances = import_arrays(f"Instances/inst{instance}.dat")
+    lb, ub = computeBounds(distances, num_couriers, num_items, courier_size, item_size)
+
+    start = time.time()
+    try:
+        # The successor model has only the integer encoding, the "_api" encodings are built through the z3 API
+        # instead of as SMT-LIB2 text
+        if encoding == "successor":
+            model = build_successor_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub)
+        elif encoding.endswith("_api"):
+            model = build_smt_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub, encoding=encoding[:-len("_api")])
+        else:
+            model = build_smt2_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub, encoding=encoding)
+    except TimeoutError:
+        conn.close()
+        return
+    build_time = time.time() - start
+
+    start = time.time()
+    best_paths, best_max_dist, optimal, _ = bisection(model, lb, ub, timelimit, num_couriers, num_items, courier_size, item_size, distances)
+    solve_time = time.time() - start
+
+    conn.send({
+        "build_time": build_time,
+        "solve_time": solve_time,
+        "obj": best_max_dist,
+        "optimal": optimal
+    })
+    conn.close()
+
+
+def measure_cp(instance, solver, approach, timelimit, warm_start, conn):
+
+    models = models_gecode if solver == "gecode" else models_chuffed
+    model_path = os.path.join("cp", "models", models[approach])
+    data = cp_data(instance, cp_heuristic(instance) if warm_start else None)
+
+    fzn_path, ozn_path, flatten_time, _ = compile_model(model_path, data, solver, cp_parameters(approach))
+
+    first_solution = []
+
+    def found(solution, elapsed):
+        if not first_solution:
+            first_solution.append(elapsed)
+
+    start = time.time()
+    solution, optimal = solve_flatzinc(fzn_path, ozn_path, solver, timelimit, found)
+    solve_time = time.time() - start
+
+    conn.send({
+        "flatten_time": flatten_time,
+        "first_time": first_solution[0] if first_solution else None,
+        "solve_time": solve_time,
+        "obj": solution["_objective"] if solution is not None else None,
+        "optimal": optimal
+    })
+    conn.close()
+
+
+def run_measure(target, args):
+
+    # Every measure runs in a fresh process, so that the peak memory is its own
+    parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=target, args=args + (child_conn,))
+    process.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        result = None
+    process.join()
+
+    return result, process.exitcode
+
+
+def benchmark(instances, formulations=tuple(FORMULATIONS)):
+
+    print(f"{'instance':>8} {'formulation':>12} {'cols':>10} {'rows':>10} {'nnz':>10} {'build (s)':>10} {'HiGHS (s)':>10} {'SCIP (s)':>10} {'RSS (MB)':>10}")
+
+    for instance in instances:
+        for formulation in formulations:
+
+            result, exitcode = run_measure(measure, (instance, formulation))
+
+            if result is None:
+                print(f"{instance:>8} {formulation:>12} failed with exit code {exitcode}")
+                continue
+
+            print(f"{instance:>8} {formulation:>12} {result['cols']:>10} {result['rows']:>10} {result['nnz']:>10} "
+                  f"{result['build_time']:>10.2f} {result['load_time']:>10.2f} {result['pywraplp_time']:>10.2f} {result['rss']:>10.0f}")
+
+    return None
+
+
+def benchmark_smt(instances, encodings=("lia_api", "lia", "pb_api", "pb", "successor"), timelimit=300):
+
+    rows = []
+    for instance in instances:
+        for encoding in encodings:
+            result, exitcode = run_measure(measure_smt, (instance, encoding, timelimit))
+            rows.append((instance, encoding, result, exitcode))
+
+    # The solver prints its progress, so the table comes at the end
+    print(f"{'instance':>8} {'encoding':>10} {'build (s)':>10} {'solve (s)':>10} {'obj':>8} {'optimal':>8}")
+    for instance, encoding, result, exitcode in rows:
+        if result is None:
+            print(f"{instance:>8} {encoding:>10} failed with exit code {exitcode} (or constraint timeout)")
+            continue
+        print(f"{instance:>8} {encoding:>10} {result['build_time']:>10.2f} {result['solve_time']:>10.2f} "
+              f"{str(result['obj']):>8} {result['optimal']:>8}")
+
+    return None
+
+
+def benchmark_cp(instances, approaches=(("gecode", "fail_rand_luby"), ("gecode", "subcircuit_fail_rand_luby"),
+                                        ("chuffed", "fail_min"), ("chuffed", "subcircuit_fail_min")), timelimit=300,
+                 warm_start=False):
+
+    rows = []
+    for instance in instances:
+        for solver, approach in approaches:
+            result, exitcode = run_measure(measure_cp, (instance, solver, approach, timelimit, warm_start))
+            rows.append((instance, f"{solver}_{approach}{'_warm' if warm_start else ''}", result, exitcode))
+
+    print(f"{'instance':>8} {'model':>34} {'flatten (s)':>12} {'first (s)':>10} {'solve (s)':>10} {'obj':>8} {'optimal':>8}")
+    for instance, name, result, exitcode in rows:
+        if result is None:
+            print(f"{instance:>8} {name:>34} failed with exit code {exitcode}")
+            continue
+        flatten_time = f"{result['flatten_time']:.2f}" if result["flatten_time"] is not None else "-"
+        first_time = f"{result['first_time']:.2f}" if result["first_time"] is not None else "-"
+        print(f"{instance:>8} {name:>34} {flatten_time:>12} {first_time:>10} {result['solve_time']:>10.2f} "
+              f"{str(result['obj']):>8} {str(result['optimal']):>8}")
+
+    return None
+
+
+if __name__ == "__main__":
+    # python3 benchmark.py [instances] for the MIP formulations, python3 benchmark.py smt [instances] for the SMT encodings,
+    # python3 benchmark.py cp [warm] [instances] for the subcircuit CP models against the u-ordering ones (warm to
+    # start them from the heuristic solution)
+    if len(sys.argv) > 1 and sys.argv[1] == "smt":
+        instances = sys.argv[2:] if len(sys.argv) > 2 else [f"{i:02d}" for i in range(1, 22)]
+        benchmark_smt(instances)
+    elif len(sys.argv) > 1 and sys.argv[1] == "cp":
+        warm_start = len(sys.argv) > 2 and sys.argv[2] == "warm"
+        instances = sys.argv[2 + warm_start:] if len(sys.argv) > 2 + warm_start else [f"{i:02d}" for i in range(1, 22)]
+        benchmark_cp(instances, warm_start=warm_start)
+    else:
+        instances = sys.argv[1:] if len(sys.argv) > 1 else [f"{i}" for i in range(11, 22)]
+        benchmark(instances)
@@ -0,0 +1,191 @@
+import numpy as np
+from math import ceil
+
+
+def shortest_paths(distances):
+
+    # Floyd-Warshall, one vectorised relaxation per intermediate node
+    dist = np.array(distances, dtype=np.int64)
+    for k in range(len(dist)):
+        np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+
+    return dist
+
+
+def max_items_per_courier(courier_size, item_size):
+
+    # A courier can carry at most as many items as the smallest ones that fit in its load
+    smallest_first = np.cumsum(np.sort(np.asarray(item_size)))
+
+    return np.searchsorted(smallest_first, np.asarray(courier_size), side='right')
+
+
+def min_items_of_busiest_courier(num_couriers, num_items, courier_size, item_size):
+
+    max_items = max_items_per_courier(courier_size, item_size)
+
+    # Smallest t such that all the items can be split with no courier carrying more than t of them
+    for t in range(ceil(num_items / num_couriers), num_items + 1):
+        if np.minimum(max_items, t).sum() >= num_items:
+            return t
+
+    return ceil(num_items / num_couriers)
+
+
+def round_trip_lower_bound(distances, num_items):
+
+    # Every item must be reached from the origin and the courier must go back
+    dist = shortest_paths(distances)
+
+    return int((dist[num_items, :num_items] + dist[:num_items, num_items]).max())
+
+
+def capacity_lower_bound(distances, num_couriers, num_items, courier_size, item_size):
+
+    dist = np.array(distances, dtype=np.int64)
+    no_self_loops = dist + np.diag(np.full(num_items + 1, dist.max() + 1))
+
+    # Some courier has to deliver at least t items, so its tour has at least t+1 arcs
+    t = min_items_of_busiest_courier(num_couriers, num_items, courier_size, item_size)
+
+    # Cheapest arc leaving (entering) each node
+    min_out = no_self_loops.min(axis=1)
+    min_in = no_self_loops.min(axis=0)
+
+    out_bound = no_self_loops[num_items, :num_items].min() + np.sort(min_out[:num_items])[:t].sum()
+    in_bound = no_self_loops[:num_items, num_items].min() + np.sort(min_in[:num_items])[:t].sum()
+
+    return int(max(out_bound, in_bound))
+
+
+def solve_assignment(cost):
+
+    # Hungarian algorithm (shortest augmenting paths), the inner loop over the columns is vectorised
+    n = cost.shape[0]
+    cost = np.vstack([np.zeros((1, n)), cost])
+    cost = np.hstack([np.zeros((n + 1, 1)), cost])
+    big = float(np.abs(cost).max() + 1) * (n + 1)
+
+    u = np.zeros(n + 1)
+    v = np.zeros(n + 1)
+    p = np.zeros(n + 1, dtype=np.int64)
+    way = np.zeros(n + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(n + 1, big)
+        used = np.zeros(n + 1, dtype=bool)
+
+        while p[j0] != 0:
+            used[j0] = True
+            i0 = p[j0]
+
+            free = ~used
+            free[0] = False
+            reduced = cost[i0] - u[i0] - v
+            better = free & (reduced < minv)
+            minv[better] = reduced[better]
+            way[better] = j0
+
+            j1 = int(np.argmin(np.where(free, minv, np.inf)))
+            delta = minv[j1]
+
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+
+        # Augment along the path found
+        while j0 != 0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    return float(cost[p[1:], np.arange(1, n + 1)].sum())
+
+
+def assignment_lower_bound(distances, num_couriers, num_items):
+
+    dist = np.array(distances, dtype=np.float64)
+    size = num_items + num_couriers
+    forbidden = float(dist.max() + 1) * size
+
+    # Items plus one copy of the origin per courier; a courier can't go straight back to the origin
+    cost = np.full((size, size), forbidden)
+    cost[:num_items, :num_items] = dist[:num_items, :num_items]
+    cost[:num_items, num_items:] = dist[:num_items, num_items, None]
+    cost[num_items:, :num_items] = dist[num_items, None, :num_items]
+    np.fill_diagonal(cost, forbidden)
+
+    # The assignment relaxation bounds the total distance, the longest tour is at least the average
+    total = solve_assignment(cost)
+
+    return ceil(round(total) / num_couriers)
+
+
+def upper_bound(distances, num_couriers, num_items, courier_size, item_size):
+
+    dist = np.array(distances, dtype=np.int64)
+    items = dist[:num_items, :num_items]
+
+    # No courier can deliver more items than the ones left once the others have one each, nor than fit its load
+    max_item_per_courier = min(num_items - num_couriers + 1, int(max_items_per_courier(courier_size, item_size).max()))
+
+    from_depot = dist[num_items, :num_items].max()
+    to_depot = dist[:num_items, num_items].max()
+
+    # Longest arc entering each item from another item
+    between_items = np.where(np.eye(num_items, dtype=bool), -1, items).max(axis=0)
+    between_items = np.sort(between_items)[::-1]
+
+    return int(between_items[:max_item_per_courier - 1].sum() + from_depot + to_depot)
+
+
+def compute_bounds(distances, num_couriers, num_items, courier_size, item_size):
+
+    lb = max(
+        round_trip_lower_bound(distances, num_items),
+        capacity_lower_bound(distances, num_couriers, num_items, courier_size, item_size),
+        assignment_lower_bound(distances, num_couriers, num_items)
+    )
+    ub = upper_bound(distances, num_couriers, num_items, courier_size, item_size)
+
+    return min(lb, ub), ub
+
+
+def implied_data(distances, num_couriers, num_items, courier_size, item_size):
+
+    dist = np.array(distances, dtype=np.int64)
+    no_self_loops = dist + np.diag(np.full(num_items + 1, dist.max() + 1))
+    shortest = shortest_paths(distances)
+
+    # Cheapest arc leaving (entering) each node
+    min_out = no_self_loops.min(axis=1)
+    min_in = no_self_loops.min(axis=0)
+
+    # Items that fit in each courier
+    eligible = np.asarray(item_size)[None, :] <= np.asarray(courier_size)[:, None]
+
+    # Most items each courier can carry (the others have one each), fewest it must carry so that the others can take the rest
+    max_items = np.minimum(np.minimum(max_items_per_courier(courier_size, item_size), eligible.sum(axis=1)), num_items - num_couriers + 1)
+    min_items = np.maximum(1, num_items - (max_items.sum() - max_items))
+
+    # Shortest tour of each courier: the round trip to the closest item it can carry, or the cheapest arcs
+    # leaving the depot and the items it must carry at least. A courier that can't carry any item has no
+    # tour, its bound is left at 0 so that it doesn't constrain max_dist
+    round_trips = shortest[num_items, :num_items] + shortest[:num_items, num_items]
+    courier_lb = [
+        int(max(round_trips[eligible[k]].min(), min_out[num_items] + np.sort(min_out[:num_items][eligible[k]])[:min_items[k]].sum()))
+        if eligible[k].any() else 0
+        for k in range(num_couriers)
+    ]
+
+    return {
+        "min_out": min_out.tolist(),
+        "min_in": min_in.tolist(),
+        "eligible": [(np.flatnonzero(row) + 1).tolist() for row in eligible],
+        "max_items": max_items.tolist(),
+        "min_items": min_items.tolist(),
+        "courier_lb": courier_lb
+    }
@@ -0,0 +1,118 @@
+import os
+import time
+import queue
+import threading
+from flatzinc_cache import start_flatzinc, read_solutions, bound_flatzinc
+
+
+def next_threshold(low, high, running):
+
+    # Middle of the widest range of thresholds in [low, high] between the probes already running in it,
+    # so that the first probes of an interval split it at its median and then at its quartiles
+    limits = [low - 1] + sorted(t for t in running if low <= t <= high) + [high + 1]
+    gaps = [(b - a, a, b) for a, b in zip(limits, limits[1:]) if b - a > 1]
+    if not gaps:
+        return None
+    _, a, b = max(gaps)
+
+    return (a + b) // 2
+
+
+def probe_bisection(fzn_path, ozn_path, solver, lb, ub, num_probes=3, timeout=300, on_solution=None):
+
+    # The optimum is in [low, high]: every probe looks for a solution with max_dist <= t, for some threshold t
+    # of the interval, in its own solver process. A solution lowers high to its objective and an unsatisfiable
+    # probe raises low to t + 1, the probes that can't narrow the interval anymore are stopped and the free
+    # slots probe the largest range left. Both bounds are valid whenever the search stops.
+    results = queue.Queue()
+    running = {}
+    stopped = set()
+    errors = []
+    workers = []
+    state = {"solution": None, "low": lb, "high": ub}
+    start = time.time()
+
+    def work(threshold, process, path):
+        try:
+            solution, status = read_solutions(process)
+        except RuntimeError as error:
+            # The failure of a probe that was stopped doesn't matter
+            solution, status = None, None
+            if process not in stopped:
+                errors.append(error)
+        os.remove(path)
+        results.put((threshold, process, solution, status))
+
+    def stop(dominated):
+        for threshold, process in running.items():
+            if dominated(threshold) and process.poll() is None:
+                stopped.add(process)
+                process.terminate()
+
+    def top():
+        # With a solution the search goes on below its objective
+        return state["high"] - 1 if state["solution"] is not None else state["high"]
+
+    def record(threshold, solution, status):
+        # The result of a stopped probe still holds if it came before the stop
+        if solution is not None and (state["solution"] is None or solution["_objective"] < state["high"]):
+            state["solution"], state["high"] = solution, solution["_objective"]
+            print(f"Solution with max_dist {state['high']} found by the probe <= {threshold}, in {time.time() - start:.1f} s")
+            if on_solution is not None:
+                on_solution(solution, time.time() - start)
+            stop(lambda t: t >= state["high"])
+        elif status == "unsatisfiable" and threshold >= state["low"]:
+            state["low"] = threshold + 1
+            print(f"No solution with max_dist <= {threshold}, in {time.time() - start:.1f} s")
+            stop(lambda t: t < state["low"])
+
+    try:
+        while state["low"] <= top() or running:
+            left = timeout - (time.time() - start)
+            if left <= 0:
+                break
+
+            # The stopped probes are still running until their process ends, but they don't take a slot
+            while len([t for t in running if state["low"] <= t <= top()]) < num_probes and state["low"] <= top():
+                threshold = next_threshold(state["low"], top(), running)
+                if threshold is None:
+                    break
+                path = bound_flatzinc(fzn_path, threshold, satisfy=True)
+                running[threshold] = start_flatzinc(path, ozn_path, solver, left)
+                workers.append(threading.Thread(target=work, args=(threshold, running[threshold], path)))
+                workers[-1].start()
+                print(f"Probing max_dist <= {threshold} in [{state['low']}, {state['high']}]")
+
+            try:
+                threshold, process, solution, status = results.get(timeout=left)
+            except queue.Empty:
+                break
+            del running[threshold]
+            record(threshold, solution, status)
+
+            # A probe failed: the others would fail the same way
+            if errors:
+                break
+
+    except KeyboardInterrupt:
+        # Interrupted (e.g. by the portfolio): keep the bounds proved so far
+        pass
+
+    # The probes still running at the time limit are stopped, what they found before is kept
+    stop(lambda t: True)
+    for worker in workers:
+        worker.join()
+    while not results.empty():
+        threshold, process, solution, status = results.get()
+        record(threshold, solution, status)
+
+    # The error of the solver is raised if nothing was found, otherwise the bounds proved so far are kept
+    if errors:
+        if state["solution"] is None:
+            raise errors[0]
+        print(errors[0])
+
+    # The lower bound met the best solution, or there is no solution at all
+    optimal = state["low"] > top()
+
+    return state["solution"], optimal, state["low"], state["high"]
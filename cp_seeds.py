@@ -0,0 +1,90 @@
+import os
+import time
+import threading
+from flatzinc_cache import start_flatzinc, read_solutions, bound_flatzinc
+
+
+def race_seeds(fzn_path, ozn_path, solver, num_seeds, threads=1, timeout=300, round_time=30, on_solution=None):
+
+    # Local coordinator of the workers: it keeps the best solution found by any of them and, at the end of each
+    # round, starts them again with new seeds on the FlatZinc bounded by the best objective so far. A restart of
+    # the random search keeps nothing but the bound anyway, so the workers lose little by being restarted.
+    lock = threading.Lock()
+    best = {"solution": None, "objective": None}
+    worker_best = [None] * num_seeds
+    optimal = False
+    interrupted = False
+    errors = []
+    round_num = 0
+    start = time.time()
+
+    while not optimal and not interrupted and time.time() - start < timeout:
+        left = timeout - (time.time() - start)
+        bound = best["objective"]
+        bounded_path = bound_flatzinc(fzn_path, bound - 1) if bound is not None else fzn_path
+
+        processes = []
+        for k in range(num_seeds):
+            options = ["--random-seed", str(round_num * num_seeds + k + 1)]
+            if threads > 1:
+                options += ["-p", str(threads)]
+            processes.append(start_flatzinc(bounded_path, ozn_path, solver, min(round_time, left), options))
+        statuses = [None] * num_seeds
+
+        def work(k):
+
+            def found(solution, elapsed):
+                objective = solution["_objective"]
+                with lock:
+                    if worker_best[k] is None or objective < worker_best[k]:
+                        worker_best[k] = objective
+                    if best["objective"] is None or objective < best["objective"]:
+                        best["solution"], best["objective"] = solution, objective
+                        if on_solution is not None:
+                            on_solution(solution, time.time() - start)
+
+            try:
+                _, statuses[k] = read_solutions(processes[k], found)
+            except RuntimeError as error:
+                # The worker may have been stopped by another one that settled the round
+                if not any(status in ("optimal", "unsatisfiable") for status in statuses):
+                    errors.append(error)
+                return
+
+            # A worker that completes its search settles the round: stop the others
+            if statuses[k] in ("optimal", "unsatisfiable"):
+                for process in processes:
+                    if process.poll() is None:
+                        process.terminate()
+
+        workers = [threading.Thread(target=work, args=(k,)) for k in range(num_seeds)]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            # Interrupted (e.g. by the portfolio): the solvers got the signal too, keep what was found so far
+            interrupted = True
+            for worker in workers:
+                worker.join()
+
+        if bounded_path != fzn_path:
+            os.remove(bounded_path)
+
+        # Optimal under the bound means optimal, no solution under the bound means the previous best is optimal
+        if "optimal" in statuses or ("unsatisfiable" in statuses and bound is not None):
+            optimal = True
+        elif "unsatisfiable" in statuses:
+            break
+
+        # The workers failed: the next rounds would fail the same way
+        if errors and not interrupted:
+            if best["solution"] is None:
+                raise errors[0]
+            print(errors[0])
+            break
+
+        round_num += 1
+
+    return best["solution"], optimal, worker_best
@@ -0,0 +1,144 @@
+import os
+from timeit import default_timer as timer
+import math
+from utils import computeBounds, import_arrays, routes_to_json
+from heuristic import construct_solution
+from ortools.sat.python import cp_model
+
+
+def main_cpsat(instance, num_workers=None):
+
+    print("Running instance", instance)
+    file_name = f"Instances/inst{instance}.dat"
+
+    timelimit = 300
+    if num_workers is None:
+        num_workers = os.cpu_count()
+
+    num_couriers, num_items, courier_size, item_size, distances = import_arrays(file_name)
+    lb, ub = computeBounds(distances, num_couriers, num_items, courier_size, item_size)
+    depot = num_items
+
+    # Initial solution from the constructive heuristic, its objective is also an upper bound
+    routes, heuristic_obj = construct_solution(distances, num_couriers, num_items, courier_size, item_size)
+    if routes is not None:
+        print("Heuristic solution found, max distance: ", heuristic_obj)
+        ub = min(ub, heuristic_obj)
+
+    model = cp_model.CpModel()
+
+    start_time = timer()
+
+    # ----------Variables----------
+
+    # The routes of all the couriers are one multiple circuit, where node 0 is the depot and item i is node i + 1
+    nodes = [depot] + list(range(num_items))
+
+    # arc[a][b]: some courier goes from node a to node b (a != b)
+    arc = [[model.NewBoolVar(f"arc_{a}_{b}") if a != b else None for b in range(num_items + 1)] for a in range(num_items + 1)]
+
+    # carry[k][i]: courier k carries item i, courier[i] is the index of that courier
+    carry = [[model.NewBoolVar(f"carry_{k}_{i}") for i in range(num_items)] for k in range(num_couriers)]
+    courier = [model.NewIntVar(0, num_couriers - 1, f"courier_{i}") for i in range(num_items)]
+
+    # dist[i]: length of the route of its courier from the depot up to item i
+    dist = [model.NewIntVar(0, ub, f"dist_{i}") for i in range(num_items)]
+
+    max_distance = model.NewIntVar(lb, ub, "max_distance")
+
+    # ----------Constraints----------
+
+    # Every item is on exactly one route, each route starts and ends at the depot
+    model.AddMultipleCircuit([(a, b, arc[a][b]) for a in range(num_items + 1) for b in range(num_items + 1) if a != b])
+
+    # One route per courier: as many routes as couriers and every courier carries some item
+    model.Add(sum(arc[0][b] for b in range(1, num_items + 1)) == num_couriers)
+
+    for i in range(num_items):
+        model.AddExactlyOne(carry[k][i] for k in range(num_couriers))
+        model.Add(courier[i] == sum(k * carry[k][i] for k in range(1, num_couriers)))
+
+    for k in range(num_couriers):
+        model.AddBoolOr(carry[k])
+
+        # Capacity
+        model.Add(sum(item_size[i] * carry[k][i] for i in range(num_items)) <= courier_size[k])
+
+    for b in range(1, num_items + 1):
+        j = nodes[b]
+        model.Add(dist[j] >= distances[depot][j]).OnlyEnforceIf(arc[0][b])
+        # The distance of each tour is at most max_distance
+        model.Add(dist[j] + distances[j][depot] <= max_distance).OnlyEnforceIf(arc[b][0])
+
+        for a in range(1, num_items + 1):
+            if a != b:
+                i = nodes[a]
+                # Consecutive items are carried by the same courier
+                model.Add(courier[i] == courier[j]).OnlyEnforceIf(arc[a][b])
+                model.Add(dist[j] >= dist[i] + distances[i][j]).OnlyEnforceIf(arc[a][b])
+
+    model.Minimize(max_distance)
+
+    # Give the heuristic solution as a hint
+    if routes is not None:
+        next_node = {}
+        for k, route in enumerate(routes):
+            path = [depot] + route + [depot]
+            next_node.update((i, j) for i, j in zip(path[1:-1], path[2:]))
+            length = 0
+            for i, j in zip(path[:-1], path[1:-1]):
+                length += int(distances[i][j])
+                model.AddHint(dist[j], length)
+            for i in range(num_items):
+                model.AddHint(carry[k][i], i in route)
+            for i in route:
+                model.AddHint(courier[i], k)
+        starts = {route[0] for route in routes}
+        for a in range(num_items + 1):
+            for b in range(num_items + 1):
+                if a != b:
+                    model.AddHint(arc[a][b], nodes[b] in starts if a == 0 else next_node.get(nodes[a]) == nodes[b])
+        model.AddHint(max_distance, heuristic_obj)
+
+    end_const = timer()
+    print(f"Constraints added in time {math.floor(end_const-start_time)} seconds.")
+
+    # ----------Solve----------
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = timelimit
+    solver.parameters.num_workers = num_workers
+
+    # Stop the search keeping the incumbent on Ctrl+C (or SIGINT from the portfolio)
+    solver.parameters.catch_sigint_signal = True
+
+    print(f"Solving with {num_workers} workers...")
+    start = timer()
+    status = solver.Solve(model)
+    end = timer()
+    time = math.floor(end - start)
+
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+
+        # Follow each route from the depot, it belongs to the courier of its items
+        best_paths = [[] for _ in range(num_couriers)]
+        for b in range(1, num_items + 1):
+            if solver.BooleanValue(arc[0][b]):
+                path = []
+                while b != 0:
+                    path.append(nodes[b] + 1)
+                    b = next(c for c in range(num_items + 1) if c != b and solver.BooleanValue(arc[b][c]))
+                best_paths[solver.Value(courier[path[0] - 1])] = path
+
+        output_dict = {
+            'max_dist': int(solver.ObjectiveValue()),
+            'optimal': "true" if status == cp_model.OPTIMAL else "false"
+        }
+        print("Max distance: ", output_dict['max_dist'], "Optimal: ", output_dict["optimal"])
+    else:
+        best_paths = []
+        output_dict = None
+
+    routes_to_json(best_paths, time, instance, output_dict, "cpsat", "ortools")
+
+    return None
@@ -0,0 +1,251 @@
+import os
+import re
+import sys
+import json
+import glob
+import time
+import hashlib
+import threading
+import subprocess
+from instance_cache import file_hash
+
+
+CACHE_DIR = os.path.join(".cache", "cp")
+
+# Total size of the cached FlatZinc files in MB, the least recently used ones are removed beyond it
+MAX_CACHE_SIZE = int(os.environ.get("CP_CACHE_MB", 4096))
+
+# Version of MiniZinc, asked once per process
+minizinc_versions = {}
+
+
+def minizinc_version():
+
+    if "minizinc" not in minizinc_versions:
+        output = subprocess.run(["minizinc", "--version"], capture_output=True, text=True, check=True).stdout
+        match = re.search(r"version (\d+(\.\d+)*)", output)
+        minizinc_versions["minizinc"] = match.group(1) if match else output.strip().replace(" ", "_")
+
+    return minizinc_versions["minizinc"]
+
+
+def cache_path(model_path, data, solver, parameters=None):
+
+    # The FlatZinc depends on the model, the data (with the parameters of the model), the library of the solver
+    # and the compiler
+    data_hash = hashlib.sha1((data + (parameters or "")).encode()).hexdigest()
+
+    return os.path.join(CACHE_DIR, f"{model_hash(model_path)}_{data_hash}_{solver}_{minizinc_version()}")
+
+
+def model_hash(model_path):
+
+    # The files of the project included by the model (next to it) are part of it, the libraries of MiniZinc aren't
+    with open(model_path) as file:
+        includes = re.findall(r'^include "([^"]+)";', file.read(), re.MULTILINE)
+    paths = [os.path.join(os.path.dirname(model_path), name) for name in includes]
+    hashes = [file_hash(model_path)] + [file_hash(path) for path in paths if os.path.exists(path)]
+
+    return hashes[0] if len(hashes) == 1 else hashlib.sha1("".join(hashes).encode()).hexdigest()
+
+
+def compile_model(model_path, data, solver, parameters=None):
+
+    path = cache_path(model_path, data, solver, parameters)
+
+    if os.path.exists(f"{path}.fzn"):
+        # The modification time marks the last use, for the eviction
+        try:
+            os.utime(f"{path}.fzn")
+        except OSError:
+            pass
+        try:
+            with open(f"{path}.json") as file:
+                flatten_time = json.load(file)["flatten_time"]
+        except (OSError, ValueError, KeyError):
+            flatten_time = None
+        return f"{path}.fzn", f"{path}.ozn", flatten_time, True
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    try:
+        # The data is too long for the command line of the large instances, it goes through a file of this process
+        with open(f"{tmp_path}.dzn", "w") as file:
+            file.write(data)
+
+        # The output is compiled in json mode, so that the solutions can be read back without the MiniZinc Python API
+        start = time.time()
+        command = ["minizinc", "-c", "--solver", solver, "--output-mode", "json", "--output-objective",
+                   model_path, f"{tmp_path}.dzn", "--fzn", f"{tmp_path}.fzn", "--ozn", f"{tmp_path}.ozn"]
+        if parameters is not None:
+            command += ["-D", parameters]
+
+        process = subprocess.run(command, capture_output=True, text=True)
+        flatten_time = time.time() - start
+
+        if process.returncode != 0:
+            raise RuntimeError(f"MiniZinc could not flatten {model_path}: {process.stderr.strip()}")
+
+        with open(f"{path}.json", "w") as file:
+            json.dump({"flatten_time": flatten_time}, file)
+
+        # The FlatZinc is renamed last: once it exists, the output specification is there too
+        os.replace(f"{tmp_path}.ozn", f"{path}.ozn")
+        os.replace(f"{tmp_path}.fzn", f"{path}.fzn")
+    finally:
+        # Whatever is left of this process, also when the flattening failed or was interrupted
+        for name in (f"{tmp_path}.dzn", f"{tmp_path}.fzn", f"{tmp_path}.ozn"):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+
+    evict(keep=path)
+
+    return f"{path}.fzn", f"{path}.ozn", flatten_time, False
+
+
+def evict(max_size=MAX_CACHE_SIZE, keep=None):
+
+    # Only the cached models have a .json, the bounded copies of the running probes and seeds are left alone
+    entries = []
+    for fzn_path in glob.glob(os.path.join(CACHE_DIR, "*.fzn")):
+        path = fzn_path[:-len(".fzn")]
+        try:
+            if os.path.exists(f"{path}.json"):
+                entries.append((os.path.getmtime(fzn_path), os.path.getsize(fzn_path) + os.path.getsize(f"{path}.ozn"), path))
+        except OSError:
+            # Removed by another process
+            continue
+
+    total = sum(size for _, size, _ in entries)
+
+    # Least recently used first
+    for _, size, path in sorted(entries):
+        if total <= max_size * 1024 * 1024:
+            break
+        if path == keep:
+            continue
+        for name in (f"{path}.fzn", f"{path}.ozn", f"{path}.json"):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+        total -= size
+        print(f"Removed {os.path.basename(path)} from the FlatZinc cache")
+
+    return None
+
+
+def start_flatzinc(fzn_path, ozn_path, solver, timeout, options=()):
+
+    command = ["minizinc", "--solver", solver, "--time-limit", str(int(timeout * 1000)), "--intermediate",
+               *options, fzn_path, "--ozn-file", ozn_path]
+
+    return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
+
+
+def read_solutions(process, on_solution=None):
+
+    # The output is read while the solver runs: each solution is a json object followed by the separator,
+    # given to on_solution (with the elapsed time) as soon as it is complete, the last one is the best
+    state = {"block": [], "solution": None, "status": None}
+    start = time.time()
+
+    # The errors of the solver are read at the same time, so that it never blocks on a full pipe
+    errors = []
+    error_reader = threading.Thread(target=lambda: errors.append(process.stderr.read()))
+    error_reader.start()
+
+    def read_line(line):
+        if line.startswith("----------"):
+            text = "".join(state["block"]).strip()
+            state["block"] = []
+            if text.startswith("{"):
+                state["solution"] = json.loads(text)
+                if on_solution is not None:
+                    on_solution(state["solution"], time.time() - start)
+        elif line.startswith("=========="):
+            state["status"] = "optimal"
+        elif line.startswith("=====UNSATISFIABLE====="):
+            state["status"] = "unsatisfiable"
+        elif not line.startswith("====="):
+            state["block"].append(line)
+
+    try:
+        for line in process.stdout:
+            read_line(line)
+    except KeyboardInterrupt:
+        # Interrupted (e.g. by the portfolio): MiniZinc got the signal too and prints its last solution before exiting
+        for line in process.stdout:
+            read_line(line)
+    process.wait()
+    error_reader.join()
+
+    # A solver that failed without any result raises its error, the solutions found before a failure are kept
+    if process.returncode > 0:
+        message = f"The solver exited with code {process.returncode}: {''.join(errors).strip()}"
+        if state["solution"] is None and state["status"] is None:
+            raise RuntimeError(message)
+        print(message)
+
+    return state["solution"], state["status"]
+
+
+def solve_flatzinc(fzn_path, ozn_path, solver, timeout, on_solution=None, options=()):
+
+    process = start_flatzinc(fzn_path, ozn_path, solver, timeout, options)
+    solution, status = read_solutions(process, on_solution)
+
+    return solution, solution is not None and status == "optimal"
+
+
+def bound_flatzinc(fzn_path, bound, satisfy=False):
+
+    # Copy of the FlatZinc where the objective must be at most bound, without flattening the model again.
+    # With satisfy the copy only looks for one such solution (keeping the search annotations), so that it
+    # either finds it or proves that there is none
+    with open(fzn_path) as file:
+        lines = file.readlines()
+
+    # The solve item is the last one of a FlatZinc file
+    solve = max(i for i, line in enumerate(lines) if line.startswith("solve"))
+    objective = re.search(r"minimize\s+(\w+)\s*;", lines[solve])
+    if objective is None:
+        raise ValueError(f"{fzn_path} does not minimize a variable.")
+    if satisfy:
+        lines[solve] = lines[solve][:objective.start()] + "satisfy;" + lines[solve][objective.end():]
+    lines.insert(solve, f"constraint int_le({objective.group(1)}, {bound});\n")
+
+    path = f"{fzn_path[:-len('.fzn')]}_{'sat' if satisfy else 'ub'}{bound}.{os.getpid()}.fzn"
+    with open(path, "w") as file:
+        file.writelines(lines)
+
+    return path
+
+
+def report():
+
+    print(f"{'flatzinc':<110} {'size (MB)':>10} {'flatten (s)':>12}")
+
+    for path in sorted(glob.glob(os.path.join(CACHE_DIR, "*.fzn"))):
+        try:
+            with open(f"{path[:-len('.fzn')]}.json") as file:
+                flatten_time = f"{json.load(file)['flatten_time']:.2f}"
+        except (OSError, ValueError, KeyError):
+            flatten_time = "-"
+        print(f"{os.path.basename(path):<110} {os.path.getsize(path) / 1024 / 1024:>10.1f} {flatten_time:>12}")
+
+    return None
+
+
+if __name__ == "__main__":
+    # python3 flatzinc_cache.py lists the cached FlatZinc files, python3 flatzinc_cache.py clear removes them and
+    # python3 flatzinc_cache.py evict <size_mb> shrinks the cache
+    if len(sys.argv) > 1 and sys.argv[1] == "clear":
+        for path in glob.glob(os.path.join(CACHE_DIR, "*")):
+            os.remove(path)
+    elif len(sys.argv) > 2 and sys.argv[1] == "evict":
+        evict(int(sys.argv[2]))
+    report()
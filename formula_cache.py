@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import glob
+import time
+from instance_cache import file_hash
+
+
+CACHE_DIR = os.path.join(".cache", "smt")
+
+# Bump it when the SMT models change, so that the formulas of the old ones are not loaded
+MODEL_VERSION = 2
+
+# Total size of the cached formulas in MB, the least recently used ones are removed beyond it
+MAX_CACHE_SIZE = int(os.environ.get("SMT_CACHE_MB", 4096))
+
+
+def cache_path(filename, key):
+
+    return os.path.join(CACHE_DIR, f"{file_hash(filename)}_{key}_v{MODEL_VERSION}.smt2")
+
+
+def lookup(filename, key):
+
+    path = cache_path(filename, key)
+
+    if not os.path.exists(path):
+        return None, None
+
+    # The modification time marks the last use, for the eviction
+    os.utime(path)
+
+    try:
+        with open(f"{path}.json") as file:
+            build_time = json.load(file)["build_time"]
+    except (OSError, ValueError, KeyError):
+        build_time = None
+
+    return path, build_time
+
+
+def store(filename, key, source_path, build_time):
+
+    path = cache_path(filename, key)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    with open(f"{path}.json", "w") as file:
+        json.dump({"build_time": build_time}, file)
+
+    # Renaming is atomic, so that concurrent runs never load a partial formula
+    os.replace(source_path, path)
+
+    evict(keep=path)
+
+    return path
+
+
+def temp_path():
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    return os.path.join(CACHE_DIR, f"{os.getpid()}_{time.time_ns()}.tmp")
+
+
+def evict(max_size=MAX_CACHE_SIZE, keep=None):
+
+    entries = []
+    for path in glob.glob(os.path.join(CACHE_DIR, "*.smt2")):
+        try:
+            entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+        except OSError:
+            # Removed by another process
+            continue
+
+    total = sum(size for _, size, _ in entries)
+
+    # Least recently used first
+    for _, size, path in sorted(entries):
+        if total <= max_size * 1024 * 1024:
+            break
+        if path == keep:
+            continue
+        for name in (path, f"{path}.json"):
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+        total -= size
+        print(f"Removed {os.path.basename(path)} from the SMT cache")
+
+    return None
+
+
+def report():
+
+    print(f"{'formula':<75} {'size (MB)':>10} {'build (s)':>10} {'last used':>20}")
+
+    for path in sorted(glob.glob(os.path.join(CACHE_DIR, "*.smt2")), key=os.path.getmtime, reverse=True):
+        try:
+            with open(f"{path}.json") as file:
+                build_time = f"{json.load(file)['build_time']:.2f}"
+        except (OSError, ValueError, KeyError):
+            build_time = "-"
+        last_used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(os.path.getmtime(path)))
+        print(f"{os.path.basename(path):<75} {os.path.getsize(path) / 1024 / 1024:>10.1f} {build_time:>10} {last_used:>20}")
+
+    return None
+
+
+if __name__ == "__main__":
+    # python3 formula_cache.py lists the cached formulas, python3 formula_cache.py evict <size_mb> shrinks the cache
+    if len(sys.argv) > 2 and sys.argv[1] == "evict":
+        evict(int(sys.argv[2]))
+    report()
@@ -0,0 +1,204 @@
+import time
+import numpy as np
+
+
+def route_length(route, distances, depot):
+
+    path = [depot] + list(route) + [depot]
+
+    return int(distances[path[:-1], path[1:]].sum())
+
+
+def insertion_costs(route, item, distances, depot):
+
+    # Extra distance when inserting the item before each position of the route
+    path = np.array([depot] + list(route) + [depot])
+
+    return distances[path[:-1], item] + distances[item, path[1:]] - distances[path[:-1], path[1:]]
+
+
+def greedy_insertion(distances, num_couriers, num_items, courier_size, item_size):
+
+    routes = [[] for _ in range(num_couriers)]
+    lengths = np.zeros(num_couriers, dtype=np.int64)
+    loads = np.zeros(num_couriers, dtype=np.int64)
+
+    # Biggest items first, they are the hardest to fit
+    for item in np.argsort(-item_size, kind='stable'):
+        best = None
+        for k in range(num_couriers):
+            if loads[k] + item_size[item] > courier_size[k]:
+                continue
+            costs = insertion_costs(routes[k], item, distances, num_items)
+            position = int(np.argmin(costs))
+
+            # Keep the tours balanced: choose the insertion giving the shortest tour
+            new_length = lengths[k] + costs[position]
+            if best is None or new_length < best[0]:
+                best = (new_length, k, position)
+
+        if best is None:
+            return None
+
+        new_length, k, position = best
+        routes[k].insert(position, int(item))
+        lengths[k] = new_length
+        loads[k] += item_size[item]
+
+    # Every courier has to deliver at least one item
+    for k in range(num_couriers):
+        if routes[k]:
+            continue
+        donors = [c for c in range(num_couriers) if len(routes[c]) > 1]
+        moved = False
+        for c in sorted(donors, key=lambda c: -lengths[c]):
+            for item in routes[c]:
+                if item_size[item] <= courier_size[k]:
+                    routes[c].remove(item)
+                    routes[k].append(item)
+                    lengths[c] = route_length(routes[c], distances, num_items)
+                    lengths[k] = route_length(routes[k], distances, num_items)
+                    moved = True
+                    break
+            if moved:
+                break
+        if not moved:
+            return None
+
+    return routes
+
+
+def savings_route(items, distances, depot):
+
+    if len(items) < 2:
+        return list(items)
+
+    items = np.array(items)
+
+    # Saving of going straight from i to j instead of passing through the origin
+    savings = distances[items, depot][:, None] + distances[depot, items][None, :] - distances[np.ix_(items, items)]
+    np.fill_diagonal(savings, np.iinfo(np.int64).min)
+    order = np.argsort(-savings, axis=None, kind='stable')
+
+    succ = {}
+    pred = {}
+    head = {i: i for i in range(len(items))}
+    tail = {i: i for i in range(len(items))}
+    merges = 0
+
+    for index in order:
+        i, j = divmod(int(index), len(items))
+        if i == j or i in succ or j in pred:
+            continue
+        # i ends a route and j starts another one: join them
+        if head[i] == j:
+            continue
+        start, end = head[i], tail[j]
+        succ[i] = j
+        pred[j] = i
+        head[end] = start
+        tail[start] = end
+        merges += 1
+        if merges == len(items) - 1:
+            break
+
+    node = next(i for i in range(len(items)) if i not in pred)
+    route = [int(items[node])]
+    while node in succ:
+        node = succ[node]
+        route.append(int(items[node]))
+
+    return route
+
+
+def two_opt(route, distances, depot, max_iterations=1000):
+
+    route = list(route)
+
+    for _ in range(max_iterations):
+        if len(route) < 3:
+            break
+        path = np.array([depot] + route + [depot])
+        forward = np.concatenate([[0], np.cumsum(distances[path[:-1], path[1:]])])
+        backward = np.concatenate([[0], np.cumsum(distances[path[1:], path[:-1]])])
+
+        # Reverse path[i+1..j]: the distances are not symmetric, so the inner arcs change cost too
+        i = np.arange(len(path) - 2)[:, None]
+        j = np.arange(len(path) - 1)[None, :]
+        delta = (distances[path[i], path[j]] + distances[path[i + 1], path[np.minimum(j + 1, len(path) - 1)]]
+                 - distances[path[i], path[i + 1]] - distances[path[j], path[np.minimum(j + 1, len(path) - 1)]]
+                 + (backward[j] - backward[i + 1]) - (forward[j] - forward[i + 1]))
+        delta = np.where((j > i + 1) & (j < len(path) - 1), delta, 0)
+
+        best = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[best] >= 0:
+            break
+        a, b = int(best[0]), int(best[1])
+        path[a + 1:b + 1] = path[a + 1:b + 1][::-1]
+        route = path[1:-1].tolist()
+
+    return route
+
+
+def improve_route(route, distances, depot):
+
+    # Keep the best between the insertion order and the savings one, then apply 2-opt
+    candidates = [route, savings_route(route, distances, depot)]
+    best = min(candidates, key=lambda r: route_length(r, distances, depot))
+
+    return two_opt(best, distances, depot)
+
+
+def relocate(routes, distances, num_items, courier_size, item_size, deadline):
+
+    lengths = [route_length(route, distances, num_items) for route in routes]
+    loads = [int(item_size[route].sum()) for route in routes]
+
+    # Move items out of the longest tour while this shortens it without creating a longer one
+    while time.time() < deadline:
+        longest = int(np.argmax(lengths))
+        if len(routes[longest]) < 2:
+            break
+        best = None
+        for position, item in enumerate(routes[longest]):
+            reduced = routes[longest][:position] + routes[longest][position + 1:]
+            reduced_length = route_length(reduced, distances, num_items)
+            for k in range(len(routes)):
+                if k == longest or loads[k] + item_size[item] > courier_size[k]:
+                    continue
+                costs = insertion_costs(routes[k], item, distances, num_items)
+                insert_at = int(np.argmin(costs))
+                new_max = max(reduced_length, lengths[k] + costs[insert_at])
+                if new_max < lengths[longest] and (best is None or new_max < best[0]):
+                    best = (new_max, position, k, insert_at, reduced_length, lengths[k] + costs[insert_at])
+        if best is None:
+            break
+        new_max, position, k, insert_at, reduced_length, new_length = best
+        item = routes[longest].pop(position)
+        routes[k].insert(insert_at, item)
+        lengths[longest], lengths[k] = reduced_length, int(new_length)
+        loads[longest] -= int(item_size[item])
+        loads[k] += int(item_size[item])
+
+    return routes
+
+
+def construct_solution(distances, num_couriers, num_items, courier_size, item_size, time_limit=1.0):
+
+    start = time.time()
+
+    distances = np.asarray(distances, dtype=np.int64)
+    courier_size = np.asarray(courier_size)
+    item_size = np.asarray(item_size)
+
+    routes = greedy_insertion(distances, num_couriers, num_items, courier_size, item_size)
+    if routes is None:
+        return None, None
+
+    routes = [improve_route(route, distances, num_items) for route in routes]
+    routes = relocate(routes, distances, num_items, courier_size, item_size, start + time_limit)
+    routes = [two_opt(route, distances, num_items) for route in routes]
+
+    obj = max(route_length(route, distances, num_items) for route in routes)
+
+    return routes, obj
@@ -0,0 +1,94 @@
+import os
+import sys
+import glob
+import hashlib
+import numpy as np
+
+
+CACHE_DIR = os.path.join(".cache", "instances")
+
+# Hashes of the files already seen by this process, keyed by (path, mtime, size)
+file_hashes = {}
+
+
+def file_hash(filename):
+
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+
+    if key not in file_hashes:
+        with open(filename, 'rb') as f:
+            file_hashes[key] = hashlib.sha1(f.read()).hexdigest()
+
+    return file_hashes[key]
+
+
+def parse_instance(filename):
+
+    with open(filename, 'r') as file:
+        data = file.read().strip().splitlines()
+
+    num_couriers = int(data[0])
+    num_items = int(data[1])
+    courier_size = np.array(data[2].split(), dtype=np.int32)
+    item_size = np.array(data[3].split(), dtype=np.int32)
+
+    # Tokenise the whole matrix at once
+    distances = np.array(" ".join(data[4:]).split(), dtype=np.int32).reshape(num_items + 1, num_items + 1)
+
+    assert len(courier_size) == num_couriers
+    assert len(item_size) == num_items
+
+    return courier_size, item_size, distances
+
+
+def compile_instance(filename):
+
+    cache_path = os.path.join(CACHE_DIR, file_hash(filename))
+
+    if os.path.exists(cache_path):
+        return cache_path
+
+    courier_size, item_size, distances = parse_instance(filename)
+
+    # Write to a temporary folder and rename it, so that concurrent runs never see a partial cache
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    np.save(os.path.join(tmp_path, "courier_size.npy"), courier_size)
+    np.save(os.path.join(tmp_path, "item_size.npy"), item_size)
+    np.save(os.path.join(tmp_path, "distances.npy"), distances)
+
+    try:
+        os.rename(tmp_path, cache_path)
+    except OSError:
+        # Another process compiled the same instance in the meantime
+        for name in os.listdir(tmp_path):
+            os.remove(os.path.join(tmp_path, name))
+        os.rmdir(tmp_path)
+
+    return cache_path
+
+
+def load_instance(filename):
+
+    cache_path = compile_instance(filename)
+
+    courier_size = np.load(os.path.join(cache_path, "courier_size.npy"))
+    item_size = np.load(os.path.join(cache_path, "item_size.npy"))
+
+    # The distance matrix is memory-mapped, no copy is made
+    distances = np.load(os.path.join(cache_path, "distances.npy"), mmap_mode='r')
+
+    return len(courier_size), len(item_size), courier_size, item_size, distances
+
+
+def compile_all(path):
+
+    for filename in sorted(glob.glob(os.path.join(path, '*.dat'))):
+        print(f"Compiling {filename} -> {compile_instance(filename)}")
+
+    return None
+
+
+if __name__ == "__main__":
+    compile_all(sys.argv[1] if len(sys.argv) > 1 else "Instances")
@@ -3,16 +3,59 @@ import sys
 import time
 from math import floor
 import sys
-from utils import create_dzn, output_to_routes, routes_to_json, import_data, computeBounds, insert_bounds_to_file
+from utils import create_dzn, output_to_routes, routes_to_json, import_arrays, computeBounds, cp_data, cp_heuristic, successors_from_routes, save_results
 from mip import main_mip
-from smt import main_smt
+from smt import main_smt, smt_key, SEARCHES, STRATEGIES
 from mip_pulp import main_mip_pulp
 from mip_pulp_highs import main_mip_pulp_highs
+from cpsat import main_cpsat
 #from mip_cplex import main_mip_cplex
+from runner import make_job, run_jobs, race_jobs
+from flatzinc_cache import compile_model, solve_flatzinc
+from cp_seeds import race_seeds
+from cp_probing import probe_bisection
+import statistics
 import minizinc
 import datetime
 
-def run_cp_instance(data_path, chosen_model, chosen_solver):
+
+# Models run by run_all_at_once and by the parallel runner, the other models of models_gecode and models_chuffed
+# are run only on demand: LNS never proves optimality and would always take the whole time limit, and the
+# subcircuit models are compared with the others by benchmark.py
+methods_gecode = ["dom_w_deg_rand_linear", "dom_w_deg_rand_luby", "fail_rand_lin_SB", "fail_rand_lin", "fail_rand_luby", "fail_rand_luby_SB"]
+
+methods_chuffed = ["fail_min", "fail_min_SB", "fail_split", "fail_split_SB"]
+
+models_gecode = {
+    "dom_w_deg_rand_linear": "model_dom_rand_linear.mzn",
+    "dom_w_deg_rand_luby": "model_dom_rand_luby.mzn",
+    "fail_rand_lin_SB": "model_fail_rand_lin_SB.mzn",
+    "fail_rand_lin": "model_fail_rand_lin.mzn",
+    "fail_rand_luby": "model_fail_rand_luby.mzn",
+    "fail_rand_luby_SB": "model_fail_rand_luby_SB.mzn",
+    "lns_luby": "model_lns.mzn",
+    "lns_linear": "model_lns.mzn",
+    "subcircuit_fail_rand_luby": "model_subcircuit_fail_rand_luby.mzn"
+}
+
+models_chuffed = {
+    "fail_min": "model_fail_min_chuffed.mzn",
+    "fail_min_SB": "model_fail_min_SB_chuffed.mzn",
+    "fail_split": "model_fail_split_chuffed.mzn",
+    "fail_split_SB": "model_fail_split_SB_chuffed.mzn",
+    "subcircuit_fail_min": "model_subcircuit_fail_min_chuffed.mzn"
+}
+
+
+def cp_parameters(approach, lns_rate=30):
+    
+    # The LNS model takes the percentage of items (or couriers) relaxed at each restart and the restart strategy
+    if approach.startswith("lns"):
+        return f"lns_rate = {lns_rate}; luby_restart = {'true' if approach == 'lns_luby' else 'false'};"
+    
+    return None
+
+def run_cp_instance(data, chosen_model, chosen_solver, on_solution=None, parameters=None, heuristic=None):
     
     chosen_model = os.path.join("cp", "models", chosen_model)
     
@@ -22,70 +65,178 @@ def run_cp_instance(data_path, chosen_model, chosen_solver):
     if not os.path.exists(chosen_model):
         raise FileNotFoundError(f"Model file {chosen_model} does not exist.")
 
-    # Check if the data file exists
-    if not os.path.exists(data_path):
-        raise FileNotFoundError(f"Data file {data_path} does not exist.")
-
-    # Load the MiniZinc model
-    model = minizinc.Model(chosen_model)
-    
-    # Add the data file to the model
-    model.add_file(data_path)
-
     # Select the solver
     solver = minizinc.Solver.lookup(chosen_solver)
     
     if solver is None:
         raise ValueError(f"Solver {chosen_solver} not found.")
     
-    # Create an instance of the MiniZinc problem
-    instance = minizinc.Instance(solver, model)
-
-    # Set a timeout of 300 seconds
-    timeout = datetime.timedelta(seconds=300)
+    # The model is flattened once per (model, data, solver, MiniZinc version), the following runs give
+    # the cached FlatZinc directly to the solver
+    fzn_path, ozn_path, flatten_time, cached = compile_model(chosen_model, data, chosen_solver, parameters)
+    if cached:
+        print(f"FlatZinc loaded from the cache, flattened in {flatten_time:.2f} s" if flatten_time is not None else "FlatZinc loaded from the cache")
+    else:
+        print(f"FlatZinc compiled in {flatten_time:.2f} s")
+    
+    # The time to the first solution is recorded, it is what the warm start should shorten
+    first_solution = []
+    
+    def found(solution, elapsed):
+        if not first_solution:
+            first_solution.append(elapsed)
+        if on_solution is not None:
+            on_solution(solution, elapsed)
     
-    #Start the timer
+    #Start the timer, the 300 seconds are for the search only
     time_start = time.time()
 
     # Run the model with the specified timeout
-    output = instance.solve(timeout=timeout)
+    solution, optimal = solve_flatzinc(fzn_path, ozn_path, chosen_solver, 300, found)
         
     # Stop timer
     time_end = floor(time.time() - time_start)
+    print(f"Search time: {time_end} s")
+    print(f"Time to the first solution: {first_solution[0]:.2f} s" if first_solution else "No solution found by the solver")
+    
+    output_dict, routes = solution_to_output(solution, optimal)
+    
+    # The heuristic solution of the warm start is still a solution when the solver didn't find any
+    # (it carries every item once, so the routes give the number of items)
+    if output_dict is None and heuristic is not None:
+        routes, obj = heuristic
+        output_dict = {
+          'succ': successors_from_routes(routes, sum(len(route) for route in routes)),
+           'u': None,
+          'max_dist': obj,
+          'optimal': "false"
+        }
+
+    return output_dict, time_end, routes
+
+
+def solution_to_output(solution, optimal):
     
     # Check if the solution is optimal
-    if output.status.has_solution():
-        if output.status == minizinc.result.Status.OPTIMAL_SOLUTION:
-            output_dict = {
-              'succ': output.solution.succ,
-               'u' :output.solution.u,
-              'max_dist': output.solution.objective,
-              'optimal': "true"
-            }
-        else:
-            output_dict = {
-              'succ': output.solution.succ,
-               'u' :output.solution.u,
-              'max_dist': output.solution.objective,
-              'optimal': "false"
-            }
+    if solution is not None:
+        # The subcircuit models have no u
+        output_dict = {
+          'succ': solution['succ'],
+           'u' :solution.get('u'),
+          'max_dist': solution['_objective'],
+          'optimal': "true" if optimal else "false"
+        }
+        routes = output_to_routes(output_dict)
     else:
         output_dict = None
+        routes = []
+    
+    return output_dict, routes
+
+
+def stream_results(instance, model_type, solver):
+    
+    # Every improving solution is stored as soon as it arrives, so that it survives a crash of the run,
+    # and the (elapsed time, objective) trace of the run is kept in traces/CP for the anytime analysis
+    key = f"{solver}_{model_type}"
+    trace = []
+    save_results({key: trace}, "CP", instance, folder="traces")
+    
+    def on_solution(solution, elapsed):
+        output_dict, routes = solution_to_output(solution, False)
+        routes_to_json(routes, 300, instance, output_dict, model_type, solver)
         
+        trace.append([round(elapsed, 3), solution['_objective']])
+        save_results({key: trace}, "CP", instance, folder="traces")
+        print(f"Solution found after {elapsed:.1f} s, max distance: {solution['_objective']}")
     
-    if output_dict is not None:
-        routes = output_to_routes(output_dict)
-    else:
-        routes = []
+    return on_solution
 
-    return output_dict, time_end, routes
+
+def run_cp_seeds(instance_num, approach, num_seeds, threads=1):
+    
+    if approach not in models_gecode:
+        print("Method not available for gecode, insert another method.")
+        return
+    
+    # The results are stored under the name of the approach with the number of seeds (and of threads)
+    name = f"{approach}_seeds{num_seeds}" if threads == 1 else f"{approach}_seeds{num_seeds}_p{threads}"
+    
+    print(f"Running instance {instance_num} with {num_seeds} seeds of {approach}, {threads} threads each")
+    
+    # The data and the current bounds are given to MiniZinc without writing cp/Instances
+    data = cp_data(instance_num)
+    
+    fzn_path, ozn_path, flatten_time, cached = compile_model(os.path.join("cp", "models", models_gecode[approach]), data, "gecode", cp_parameters(approach))
+    
+    time_start = time.time()
+    solution, optimal, worker_best = race_seeds(fzn_path, ozn_path, "gecode", num_seeds, threads, on_solution=stream_results(instance_num, name, "gecode"))
+    time_end = floor(time.time() - time_start)
+    
+    output_dict, routes = solution_to_output(solution, optimal)
+    routes_to_json(routes, time_end, instance_num, output_dict, name, "gecode")
+    
+    # Best of the K workers and spread of their best objectives
+    found = [objective for objective in worker_best if objective is not None]
+    if found:
+        stats = {
+            "workers": worker_best,
+            "best": min(found),
+            "mean": statistics.mean(found),
+            "variance": statistics.pvariance(found)
+        }
+        save_results({f"gecode_{name}_stats": stats}, "CP", instance_num, folder="traces")
+        print(f"Best of {num_seeds}: {stats['best']}, mean: {stats['mean']:.1f}, variance: {stats['variance']:.1f}, optimal: {output_dict['optimal']}")
+    else:
+        print("No value for the objective function was found.")
+    
+    return None
 
 
-def run_all_cp(solver):
+def run_cp_probing(instance_num, solver, approach, num_probes=3):
+    
+    models = {"gecode": models_gecode, "chuffed": models_chuffed}.get(solver, {})
+    
+    # LNS relaxes the last solution, which a satisfaction probe doesn't have
+    if approach not in models or approach.startswith("lns"):
+        print(f"Method not available for probing with {solver}, insert another method.")
+        return
     
-    methods_gecode = ["dom_w_deg_rand_linear", "dom_w_deg_rand_luby", "fail_rand_lin_SB", "fail_rand_lin", "fail_rand_luby", "fail_rand_luby_SB"]
+    # The results are stored under the name of the approach with the number of probes
+    name = f"{approach}_probe{num_probes}"
     
-    methods_chuffed = ["fail_min", "fail_min_SB", "fail_split", "fail_split_SB"]
+    print(f"Running instance {instance_num} with {num_probes} probes of {approach}, solver {solver}")
+    
+    # The probes search in [lb, ub], the domain of max_dist in the data
+    num_couriers, num_items, courier_size, item_size, distances = import_arrays(f"Instances/inst{instance_num}.dat")
+    lb, ub = computeBounds(distances, num_couriers, num_items, courier_size, item_size)
+    
+    # The data and the current bounds are given to MiniZinc without writing cp/Instances
+    data = cp_data(instance_num)
+    
+    fzn_path, ozn_path, flatten_time, cached = compile_model(os.path.join("cp", "models", models[approach]), data, solver, cp_parameters(approach))
+    
+    time_start = time.time()
+    solution, optimal, low, high = probe_bisection(fzn_path, ozn_path, solver, lb, ub, num_probes, on_solution=stream_results(instance_num, name, solver))
+    time_end = floor(time.time() - time_start)
+    
+    output_dict, routes = solution_to_output(solution, optimal)
+    routes_to_json(routes, time_end, instance_num, output_dict, name, solver)
+    
+    # The bounds proved by the probes, also when the time limit stopped them
+    save_results({f"{solver}_{name}_bounds": {"lb": low, "ub": high, "optimal": optimal}}, "CP", instance_num, folder="traces")
+    
+    if solution is not None:
+        print(f"Max distance: {high}, lower bound: {low}, optimal: {output_dict['optimal']}\n")
+    elif optimal:
+        print("The instance has no solution.\n")
+    else:
+        print(f"No value for the objective function was found, lower bound: {low}\n")
+    
+    return None
+
+
+def run_all_cp(solver):
     
     if solver == "gecode":
         print("Solver used: ", solver)
@@ -93,18 +244,7 @@ def run_all_cp(solver):
         for model in methods_gecode:
             print("----------------------------------------------------------------")
             
-            if model == "dom_w_deg_rand_linear":
-                model_type = "model_dom_rand_linear.mzn"
-            elif model == "dom_w_deg_rand_luby":
-                model_type = "model_dom_rand_luby.mzn"
-            elif model == "fail_rand_lin_SB":
-                model_type = "model_fail_rand_lin_SB.mzn"
-            elif model == "fail_rand_lin":
-                model_type = "model_fail_rand_lin.mzn"
-            elif model == "fail_rand_luby":
-                model_type = "model_fail_rand_luby.mzn"
-            elif model == "fail_rand_luby_SB":
-                model_type = "model_fail_rand_luby_SB.mzn"
+            model_type = models_gecode[model]
                 
             
             print("Using model " + model)    
@@ -116,14 +256,10 @@ def run_all_cp(solver):
         
                 print("Running instance", instance)
             
-                file_name = f"./cp/Instances/inst{instance}.dzn"
-                file_name_dat = f"Instances/inst{instance}.dat"
-                num_couriers, num_items, courier_size, item_size, distances = import_data(file_name_dat)
-                lb, ub = computeBounds(distances, num_couriers, num_items)
-            
-                insert_bounds_to_file(file_name, lb, ub)
+                # The data and the current bounds are given to MiniZinc without writing cp/Instances
+                data = cp_data(instance)
         
-                output_dict, time, routes = run_cp_instance(file_name, model_type, solver)
+                output_dict, time, routes = run_cp_instance(data, model_type, solver, stream_results(instance, model, solver), cp_parameters(model))
 
                 routes_to_json(routes, time, instance, output_dict, model, solver)
         
@@ -141,14 +277,7 @@ def run_all_cp(solver):
             nameModel = model
             model = f"{model}_{solver}"
             
-            if model == "fail_min_SB_chuffed":
-                model_type = "model_fail_min_SB_chuffed.mzn"
-            elif model == "fail_split_chuffed":
-                model_type = "model_fail_split_chuffed.mzn"
-            elif model == "fail_min_chuffed":
-                model_type = "model_fail_min_chuffed.mzn"
-            elif model == "fail_split_SB_chuffed":
-                model_type = "model_fail_split_SB_chuffed.mzn"
+            model_type = models_chuffed[nameModel]
                 
         
             print("Using model " + model)    
@@ -160,14 +289,10 @@ def run_all_cp(solver):
         
                 print("Running instance", instance)
             
-                file_name = f"./cp/Instances/inst{instance}.dzn"
-                file_name_dat = f"Instances/inst{instance}.dat"
-                num_couriers, num_items, courier_size, item_size, distances = import_data(file_name_dat)
-                lb, ub = computeBounds(distances, num_couriers, num_items)
-            
-                insert_bounds_to_file(file_name, lb, ub)
+                # The data and the current bounds are given to MiniZinc without writing cp/Instances
+                data = cp_data(instance)
         
-                output_dict, time, routes = run_cp_instance(file_name, model_type, solver)
+                output_dict, time, routes = run_cp_instance(data, model_type, solver, stream_results(instance, nameModel, solver))
 
                 routes_to_json(routes, time, instance, output_dict, nameModel, solver)
         
@@ -257,49 +382,214 @@ def run_all_at_once():
 
 
 
-def run_chosen_approach_cp(instance_num, solver, approach):
+def build_all_jobs():
+    orT_available_inst = [1,2,3,4,5,6,7,8,9,10,13,16]
+    
+    instances = [f"0{i}" if i < 10 else f"{i}" for i in range(1,22)]
+    
+    jobs = []
+    
+    # Same (approach, instance) pairs, in the same order, as run_all_at_once
+    for solver, methods in [("gecode", methods_gecode), ("chuffed", methods_chuffed)]:
+        for approach in methods:
+            for instance in instances:
+                jobs.append(make_job(f"cp {solver} {approach} inst{instance}", run_chosen_approach_cp, (instance, solver, approach), "CP", instance, f"{solver}_{approach}"))
+    
+    for instance in instances:
+        jobs.append(make_job(f"smt inst{instance}", main_smt, (instance,), "SMT", instance, "Z3"))
+        
+    for instance in instances:
+        if int(instance) in orT_available_inst:
+            jobs.append(make_job(f"mip_ortools inst{instance}", main_mip, (instance,), "MIP", instance, "ortools"))
+            
+    for instance in instances[:10]:
+        jobs.append(make_job(f"mip_pulp_cbc inst{instance}", main_mip_pulp, (instance,), "MIP", instance, "pulp_CBC"))
+        
+    for instance in instances[:10] + ["16"]:
+        jobs.append(make_job(f"mip_pulp_highs inst{instance}", main_mip_pulp_highs, (instance,), "MIP", instance, "pulp_HIGHS"))
+    
+    return jobs
+
+
+def run_all_parallel(num_workers, memory_limit=None):
+    
+    print(f"Running all with {num_workers} workers")
+    if memory_limit is not None:
+        print(f"Memory limit per worker: {memory_limit} GB")
+    
+    run_jobs(build_all_jobs(), num_workers, memory_limit)
+    
+    return None
+
+
+def build_portfolio_jobs(instance_num, backends):
+    
+    jobs = []
+    
+    for backend in backends:
+        if backend == "gecode":
+            jobs.append(make_job(f"gecode fail_rand_luby inst{instance_num}", run_chosen_approach_cp, (instance_num, "gecode", "fail_rand_luby"), "CP", instance_num, "gecode_fail_rand_luby"))
+        elif backend == "chuffed":
+            jobs.append(make_job(f"chuffed fail_min inst{instance_num}", run_chosen_approach_cp, (instance_num, "chuffed", "fail_min"), "CP", instance_num, "chuffed_fail_min"))
+        elif backend == "smt":
+            jobs.append(make_job(f"smt inst{instance_num}", main_smt, (instance_num,), "SMT", instance_num, "Z3"))
+        elif backend == "mip_ortools":
+            jobs.append(make_job(f"mip_ortools inst{instance_num}", main_mip, (instance_num,), "MIP", instance_num, "ortools"))
+        elif backend == "mip_highs":
+            jobs.append(make_job(f"mip_pulp_highs inst{instance_num}", main_mip_pulp_highs, (instance_num,), "MIP", instance_num, "pulp_HIGHS"))
+        elif backend == "mip_cbc":
+            jobs.append(make_job(f"mip_pulp_cbc inst{instance_num}", main_mip_pulp, (instance_num,), "MIP", instance_num, "pulp_CBC"))
+        elif backend == "cpsat":
+            jobs.append(make_job(f"cpsat inst{instance_num}", main_cpsat, (instance_num,), "CP", instance_num, "ortools_cpsat"))
+        else:
+            raise ValueError(f"Backend {backend} not available for the portfolio.")
+    
+    return jobs
+
+
+def run_portfolio(instance_num, backends=("gecode", "smt", "mip_ortools", "mip_highs")):
+    
+    print(f"Running portfolio on instance {instance_num} with backends: {', '.join(backends)}")
+    
+    jobs = build_portfolio_jobs(instance_num, backends)
+    
+    time_start = time.time()
+    winner, results = race_jobs(jobs)
+    time_end = floor(time.time() - time_start)
+    
+    # The lower bound of the instance holds for every backend, the ones that know a better bound store it
+    # with their result, and an optimal solution is its own bound
+    num_couriers, num_items, courier_size, item_size, distances = import_arrays(f"Instances/inst{instance_num}.dat")
+    lb, ub = computeBounds(distances, num_couriers, num_items, courier_size, item_size)
+    
+    # Each backend's incumbent and bound, with optimal as a bool whatever the format of its approach
+    results_portfolio = {}
+    for name, result in results.items():
+        optimal = result["optimal"] in (True, "true")
+        results_portfolio[name] = {
+            "time": result["time"],
+            "optimal": optimal,
+            "obj": result["obj"],
+            "sol": result["sol"],
+            "bound": result["obj"] if optimal else max(lb, result.get("bound", lb))
+        }
+    
+    # Keep the best incumbent among the backends, and the best bound proved by any of them
+    bound = max([entry["bound"] for entry in results_portfolio.values()], default=lb)
+    solved = [name for name in results if results[name]["sol"] != "N/A"]
+    if solved:
+        best = min(solved, key=lambda name: results[name]["obj"])
+        if winner is not None:
+            best = winner
+        is_optimal = winner is not None
+        results_portfolio["portfolio"] = {
+            "time": time_end if is_optimal else 300,
+            "optimal": is_optimal,
+            "obj": results[best]["obj"],
+            "sol": results[best]["sol"],
+            "bound": results[best]["obj"] if is_optimal else bound
+        }
+        print(f"Best solution from {best}, max distance: {results[best]['obj']}, optimal: {is_optimal}, bound: {results_portfolio['portfolio']['bound']}")
+    else:
+        print("No value for the objective function was found.")
+        results_portfolio["portfolio"] = {
+            "time": 300,
+            "optimal": False,
+            "obj": 0,
+            "sol": "N/A",
+            "bound": bound
+        }
+    
+    save_results(results_portfolio, "PORTFOLIO", instance_num)
+    
+    return None
+
+
+def run_smt_portfolio(instance_num, strategies=("default", "maxres", "card", "sat")):
+    
+    print(f"Running SMT portfolio on instance {instance_num} with strategies: {', '.join(strategies)}")
     
-    methods_gecode = ["dom_w_deg_rand_linear", "dom_w_deg_rand_luby", "fail_rand_lin_SB", "fail_rand_lin", "fail_rand_luby", "fail_rand_luby_SB"]
+    # One process per strategy, on the same formula (built once and then loaded from the cache)
+    jobs = []
+    for strategy in strategies:
+        search = "optimize" if strategy == "maxres" else "bisection"
+        jobs.append(make_job(f"smt {strategy} inst{instance_num}", main_smt, (instance_num, search, "lia", "three_index", "smt2", False, True, strategy), "SMT", instance_num, smt_key(search, strategy=strategy)))
     
-    methods_chuffed = ["fail_min", "fail_min_SB", "fail_split", "fail_split_SB"]
+    time_start = time.time()
+    winner, results = race_jobs(jobs)
+    time_end = floor(time.time() - time_start)
+    
+    # Keep the best solution among the strategies
+    solved = [name for name in results if results[name]["sol"] != "N/A"]
+    if solved:
+        best = winner if winner is not None else min(solved, key=lambda name: results[name]["obj"])
+        result = {
+            "time": time_end if winner is not None else 300,
+            "optimal": "true" if winner is not None else "false",
+            "obj": results[best]["obj"],
+            "sol": results[best]["sol"]
+        }
+        print(f"Best solution from {best}, max distance: {result['obj']}, optimal: {result['optimal']}")
+    else:
+        print("No value for the objective function was found.")
+        result = {
+            "time": 300,
+            "optimal": "false",
+            "obj": 0,
+            "sol": "N/A"
+        }
+    
+    save_results({"Z3_portfolio": result}, "SMT", instance_num)
+    
+    return None
+
+
+def warm_start_heuristic(instance_num):
+    
+    # Heuristic solution for the warm start of a CP run, None if the heuristic gives no solution the models allow
+    heuristic = cp_heuristic(instance_num)
+    if heuristic is not None:
+        print("Warm start from the heuristic solution, max distance: ", heuristic[1])
+    else:
+        print("No heuristic solution for the warm start, the search starts from scratch")
+    
+    return heuristic
+
+
+def run_chosen_approach_cp(instance_num, solver, approach, lns_rate=30, warm_start=False):
+    
+    # Only the LNS models relax part of the solution
+    if lns_rate != 30 and not approach.startswith("lns"):
+        print(f"The relaxation rate is used only by the LNS models, ignoring it for {approach}.")
+        lns_rate = 30
     
     if solver == "gecode":
         
-        if approach not in methods_gecode:
+        if approach not in models_gecode:
             print("Method not available for gecode, insert another method.")
             return
         
         else:
             
-            if approach == "dom_w_deg_rand_linear":
-                 model_type = "model_dom_rand_linear.mzn"
-            elif approach == "dom_w_deg_rand_luby":
-                model_type = "model_dom_rand_luby.mzn"
-            elif approach == "fail_rand_lin_SB":
-                model_type = "model_fail_rand_lin_SB.mzn"
-            elif approach == "fail_rand_lin":
-                model_type = "model_fail_rand_lin.mzn"
-            elif approach == "fail_rand_luby":
-                model_type = "model_fail_rand_luby.mzn"
-            elif approach == "fail_rand_luby_SB":
-                model_type = "model_fail_rand_luby_SB.mzn"
-    
+            model_type = models_gecode[approach]
+            
+            # The results of LNS with another relaxation rate are stored under their own key
+            name = approach if lns_rate == 30 else f"{approach}_{lns_rate}"
+            # and so are the warm started ones
+            name = f"{name}_warm" if warm_start else name
         
         
             print(f"Running instance {instance_num}")
             print("Solver used: Gecode")
         
-            file_name = f"./cp/Instances/inst{instance_num}.dzn"
-            file_name_dat = f"Instances/inst{instance_num}.dat"
-            num_couriers, num_items, courier_size, item_size, distances = import_data(file_name_dat)
+            heuristic = warm_start_heuristic(instance_num) if warm_start else None
         
-            lb, ub = computeBounds(distances, num_couriers, num_items)
-       
-            insert_bounds_to_file(file_name, lb, ub)
+            # The data and the current bounds are given to MiniZinc without writing cp/Instances
+            data = cp_data(instance_num, heuristic)
         
-            output_dict, time, routes = run_cp_instance(file_name, model_type, solver)
+            output_dict, time, routes = run_cp_instance(data, model_type, solver, stream_results(instance_num, name, solver), cp_parameters(approach, lns_rate), heuristic)
 
-            routes_to_json(routes, time, instance_num, output_dict, approach, solver)
+            routes_to_json(routes, time, instance_num, output_dict, name, solver)
         
             if output_dict != None:
                 print("Max distance: ", output_dict['max_dist'], "Optimal: ", output_dict["optimal"],"\n")
@@ -307,38 +597,28 @@ def run_chosen_approach_cp(instance_num, solver, approach):
                 print("\n")
                 
     elif solver == "chuffed":
-        if approach not in methods_chuffed:
+        if approach not in models_chuffed:
             print("Method not available for chuffed, insert another method.")
             return
         
         else:   
-            nameModel = approach 
-            approach = f"{approach}_{solver}"
+            model_type = models_chuffed[approach]
             
-            if approach == "fail_min_SB_chuffed":
-                 model_type = "model_fail_min_SB_chuffed.mzn"
-            elif approach == "fail_split_chuffed":
-                model_type = "model_fail_split_chuffed.mzn"
-            elif approach == "fail_min_chuffed":
-                model_type = "model_fail_min_chuffed.mzn"
-            elif approach == "fail_split_SB_chuffed":
-                model_type = "model_fail_split_SB_chuffed.mzn"
+            # The warm started runs are stored under their own key
+            nameModel = f"{approach}_warm" if warm_start else approach
+            approach = f"{approach}_{solver}"
             
     
             print("Solver used: chuffed")
         
             print(f"Running instance {instance_num} with {approach} model")
             
+            heuristic = warm_start_heuristic(instance_num) if warm_start else None
         
-            file_name = f"./cp/Instances/inst{instance_num}.dzn"
-            file_name_dat = f"Instances/inst{instance_num}.dat"
-            num_couriers, num_items, courier_size, item_size, distances = import_data(file_name_dat)
-        
-            lb, ub = computeBounds(distances, num_couriers, num_items)
-       
-            insert_bounds_to_file(file_name, lb, ub)
+            # The data and the current bounds are given to MiniZinc without writing cp/Instances
+            data = cp_data(instance_num, heuristic)
         
-            output_dict, time, routes = run_cp_instance(file_name, model_type, solver)
+            output_dict, time, routes = run_cp_instance(data, model_type, solver, stream_results(instance_num, nameModel, solver), None, heuristic)
 
             routes_to_json(routes, time, instance_num, output_dict, nameModel, solver)
         
@@ -354,7 +634,7 @@ def run_chosen_approach_cp(instance_num, solver, approach):
     return None
 
 
-def run_chosen_approach(instance_num, method):
+def run_chosen_approach(instance_num, method, formulation="mtz"):
     
     if method == "smt":
         print("----------------------------------------------------------------")
@@ -364,25 +644,25 @@ def run_chosen_approach(instance_num, method):
     elif method == "mip_ortools":
         print("----------------------------------------------------------------")
         print("Executing mip with ortools...")
-        main_mip(instance_num)
+        main_mip(instance_num, formulation)
         
     elif method == "mip_pulp":
         print("----------------------------------------------------------------")
         
         print("Executing mip with pulp using CBC...")
-        if int(instance_num) > 10:
+        if int(instance_num) > 10 and formulation != "two_index":
             print("PuLP with CBC solver cannot solve instances larger than 10!")
         else:
-            main_mip_pulp(instance_num)
+            main_mip_pulp(instance_num, formulation)
         
         
         print("----------------------------------------------------------------")
         
         print("Executing mip with PuLP using HIGHS...")
-        if int(instance_num) > 10 and int(instance_num) != 16:
+        if int(instance_num) > 10 and int(instance_num) != 16 and formulation != "two_index":
             print("PuLP with HIGHS solver cannot solve instances larger than 10 except 16!")
         else:
-            main_mip_pulp_highs(instance_num)
+            main_mip_pulp_highs(instance_num, formulation)
         
     
     
@@ -392,7 +672,68 @@ def run_chosen_approach(instance_num, method):
 
 def main():
     
-    if len(sys.argv) == 4:
+    if len(sys.argv) > 1 and sys.argv[1] == "parallel":
+        num_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+        memory_limit = float(sys.argv[3]) if len(sys.argv) > 3 else None
+        run_all_parallel(num_workers, memory_limit)
+    
+    elif len(sys.argv) > 2 and sys.argv[1] == "portfolio":
+        instance_num = sys.argv[2]
+        if len(sys.argv) > 3:
+            run_portfolio(instance_num, sys.argv[3].split(","))
+        else:
+            run_portfolio(instance_num)
+    
+    elif len(sys.argv) > 4 and sys.argv[1] == "seeds":
+        threads = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+        run_cp_seeds(sys.argv[3], sys.argv[2], int(sys.argv[4]), threads)
+    
+    elif len(sys.argv) > 4 and sys.argv[1] == "probe":
+        num_probes = int(sys.argv[5]) if len(sys.argv) > 5 else 3
+        run_cp_probing(sys.argv[4], sys.argv[2], sys.argv[3], num_probes)
+    
+    elif len(sys.argv) > 2 and sys.argv[1] == "smt_portfolio":
+        instance_num = sys.argv[2]
+        if len(sys.argv) > 3:
+            run_smt_portfolio(instance_num, sys.argv[3].split(","))
+        else:
+            run_smt_portfolio(instance_num)
+    
+    elif len(sys.argv) > 2 and sys.argv[1] == "cpsat":
+        instance_num = sys.argv[2]
+        num_workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        main_cpsat(instance_num, num_workers)
+    
+    elif len(sys.argv) > 3 and sys.argv[1] == "smt":
+        # Search strategy of the SMT solver (bisection or optimize), encoding of the constraints (lia or pb),
+        # formulation (three_index or successor), builder (smt2 or api), dump of the SMT-LIB2 file, nocache,
+        # strategy (maxres, qflia, card or sat) and threads=<n> for the parallel mode of z3, in any order
+        options = sys.argv[3:]
+        known = SEARCHES + ("lia", "pb", "three_index", "successor", "smt2", "api", "dump", "nocache") + STRATEGIES[1:]
+        unknown = [option for option in options if option not in known and not (option.startswith("threads=") and option[len("threads="):].isdigit())]
+        if unknown:
+            sys.exit(f"Unknown SMT options: {', '.join(unknown)}. Use any of: {', '.join(known)}, threads=<n>.")
+        search = next((option for option in options if option in SEARCHES), "bisection")
+        encoding = next((option for option in options if option in ("lia", "pb")), "lia")
+        formulation = next((option for option in options if option in ("three_index", "successor")), "three_index")
+        builder = next((option for option in options if option in ("smt2", "api")), "smt2")
+        strategy = next((option for option in options if option in STRATEGIES[1:]), "default")
+        threads = next((int(option.split("=")[1]) for option in options if option.startswith("threads=")), 1)
+        main_smt(sys.argv[2], search, encoding, formulation, builder, "dump" in options, "nocache" not in options, strategy, threads)
+    
+    elif len(sys.argv) == 4 and sys.argv[1] in ("mip_ortools", "mip_pulp"):
+        instance_num = sys.argv[2]
+        method = sys.argv[1]
+        formulation = sys.argv[3]
+        run_chosen_approach(instance_num, method, formulation)
+    
+    elif len(sys.argv) > 4 and sys.argv[1] in ("gecode", "chuffed"):
+        # The percentage of relaxed items of LNS and/or warm, to start the search from the heuristic solution
+        options = sys.argv[4:]
+        lns_rate = next((int(option) for option in options if option.isdigit()), 30)
+        run_chosen_approach_cp(sys.argv[3], sys.argv[1], sys.argv[2], lns_rate, "warm" in options)
+    
+    elif len(sys.argv) == 4:
     
         instance_num = sys.argv[3]
         solver = sys.argv[1]
@@ -408,7 +749,7 @@ def main():
         run_all_at_once()
     
     else:
-        print("You must provide 4 args for cp, 3 args for smt/mip or no arguments if you want to run all at once.")
+        print("You must provide 4 args for cp, 3 args for smt/mip (more to choose the SMT search, encoding and formulation, 4 for the MIP formulation), 'parallel [num_workers] [memory_limit_gb]', 'portfolio <instance> [backends]', 'smt_portfolio <instance> [strategies]', 'seeds <approach> <instance> <num_seeds> [threads]', 'probe <solver> <approach> <instance> [num_probes]', 'cpsat <instance> [num_workers]' or no arguments if you want to run all at once.")
         return
 
 
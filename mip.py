@@ -3,117 +3,69 @@ import os
 from timeit import default_timer as timer
 import time
 import math
-import json
-from utils import computeBounds, import_data
+from utils import computeBounds, import_arrays, save_results, routes_from_arcs
+from heuristic import construct_solution
+from mip_model import build_model, courier_arcs, start_values, to_pywraplp, pywraplp_values, pywraplp_add_rows, solve_with_subtour_cuts
 import gc
 
 
-def main_mip(instance):
+def main_mip(instance, formulation="mtz"):
             
     print("Running instance", instance)
     file_name = f"Instances/inst{instance}.dat"
     
-    num_couriers, num_items, courier_size, item_size, distances = import_data(file_name)
-    solver = pywraplp.Solver.CreateSolver('SCIP')
-
-
-    # Create variables
-    visit = [[[solver.IntVar(0, 1, f'visit_{k}_{i}_{j}') for j in range(num_items + 1)] for i in range(num_items + 1)] for k in range(num_couriers)]
-    load = [[solver.IntVar(0,1, f'load_{i}_{j}') for j in range(num_items)] for i in range(num_couriers)]
-    u = [[solver.IntVar(0, solver.infinity(), f'u_{i}_{j}') for j in range(num_items +1)] for i in range(num_couriers)] 
-
-    #max_distance = solver.IntVar(0, solver.infinity(), 'max_distance')
-    lb, ub = computeBounds(distances, num_couriers, num_items)
-    max_distance = solver.IntVar(lb, ub, 'max_distance')
-
+    num_couriers, num_items, courier_size, item_size, distances = import_arrays(file_name)
+    lb, ub = computeBounds(distances, num_couriers, num_items, courier_size, item_size)
     
-
-    # ----------Constraints----------
-
-    #Each customer should be visited only once
-    for j in range(num_items):
-        solver.Add(sum(load[i][j] for i in range(num_couriers)) == 1)
-    
-    for i in range(num_items):
-        solver.Add(sum(visit[k][i][j] for k in range(num_couriers) for j in range(num_items + 1) ) == 1)
-        
-    for i in range(num_items):
-        solver.Add(sum(visit[k][j][i] for k in range(num_couriers) for j in range(num_items + 1) ) == 1)
+    # Initial solution from the constructive heuristic, its objective is also an upper bound
+    routes, heuristic_obj = construct_solution(distances, num_couriers, num_items, courier_size, item_size)
+    if routes is not None:
+        print("Heuristic solution found, max distance: ", heuristic_obj)
+        ub = min(ub, heuristic_obj)
     
+    # Build the model as sparse arrays and load it in SCIP, the heuristic solution is given as a hint
+    model = build_model(formulation, num_couriers, num_items, courier_size, item_size, distances, lb, ub)
+    start_solution = start_values(model, routes, heuristic_obj) if routes is not None else None
+    solver = to_pywraplp(model, 'SCIP', start_solution)
 
-    for i in range(num_items):
-        for k in range(num_couriers):
-            solver.Add(sum(visit[k][i][j] for j in range(num_items+1)) == sum(visit[k][j][i] for j in range(num_items + 1)))
-
-    # Ensure no self-loop
-    for i in range(num_couriers):
-        solver.Add(sum(visit[i][j][j] for j in range(num_items)) == 0)
-
-    # Ensure consistent visits for each courier
-    for i in range(num_items):
-        for k in range(num_couriers):
-            solver.Add(sum(visit[k][i][j] for j in range(num_items + 1)) == load[k][i])\
-            
-    for i in range(num_items):
-        for k in range(num_couriers):
-            solver.Add(sum(visit[k][j][i] for j in range(num_items + 1)) == load[k][i])
-
-    # Capacity constraint
-    for i in range(num_couriers):
-        solver.Add(sum(load[i][j] * item_size[j] for j in range(num_items)) <= courier_size[i])
-
-
-    # Ensure each courier starts and ends at the depot exactly once
-    for k in range(num_couriers):
-        solver.Add(sum(visit[k][num_items][i] for i in range(num_items)) == 1)
-        solver.Add(sum(visit[k][i][num_items] for i in range(num_items)) == 1)
-
-    for i in range(num_couriers):
-        solver.Add(sum(visit[i][j][k] * distances[j][k] for j in range(num_items + 1) for k in range(num_items + 1)) <= max_distance)
-
-
-    # MTZ constraint
-    for i in range(num_couriers):
-        for j in range(num_items + 1):
-            for k in range(num_items + 1):
-                if j != num_items and j != k:
-                    solver.Add(u[i][j] - u[i][k] + num_items * visit[i][j][k] <= num_items - 1)
-
-
-    solver.Minimize(max_distance)
     solver.set_time_limit(300000)   
+
+    # SCIP's sparsify presolver can stall for minutes on these models once the objective bounds are tight
+    solver.SetSolverSpecificParametersAsString("presolving/sparsify/maxrounds = 0\n")
         
             
     print("Constraint defined, starting the solving process...")
     start = timer()
-    status = solver.Solve()
+    if formulation == "lazy":
+        # Solve without the subtour constraints, adding only the violated ones and solving again
+        def solve(time_left):
+            solver.set_time_limit(int(time_left * 1000))
+            result = solver.Solve()
+            if result == pywraplp.Solver.OPTIMAL:
+                return "Optimal", pywraplp_values(solver)
+            if result == pywraplp.Solver.FEASIBLE:
+                return "Feasible", pywraplp_values(solver)
+            return "Not Solved", None
+
+        lazy_status, values = solve_with_subtour_cuts(model, solve, lambda cuts: pywraplp_add_rows(solver, cuts), 300, start_solution)
+        status = {"Optimal": pywraplp.Solver.OPTIMAL, "Feasible": pywraplp.Solver.FEASIBLE}.get(lazy_status, pywraplp.Solver.NOT_SOLVED)
+    else:
+        status = solver.Solve()
+        values = pywraplp_values(solver)
     end_time = timer()
     
     time = math.floor(end_time - start)
+    
+    visit = courier_arcs(model, values) if values is not None and len(values) == model["num_cols"] else None
         
-    solver_name = "ortools"
+    # The results of the other formulations are stored under their own key
+    solver_name = "ortools" if formulation == "mtz" else f"ortools_{formulation}"
 
-    best_paths_dict = {}
     if status == pywraplp.Solver.OPTIMAL:
         is_optimal = True
-        for i in range(num_couriers):
-            for j in range(num_items+1):
-                for k in range(num_items+1):
-                    if visit[i][j][k].solution_value() > 0:
-                        best_paths_dict[(i, j)] = k
-        best_paths = [[] for i in range(num_couriers)]
-        
-        for i in range(num_couriers):
-            k = num_items
-            while k != num_items or len(best_paths[i]) == 0:
-                if (i, k) in best_paths_dict.keys():
-                    if best_paths_dict[(i, k)] != num_items:
-                        best_paths[i].append(best_paths_dict[(i, k)] + 1)
-                    k = best_paths_dict[(i, k)]
-                else:
-                    break
+        best_paths = routes_from_arcs(visit)
         
-        best_max_dist = int(max_distance.solution_value())
+        best_max_dist = int(round(values[model["max_distance"]]))
         print("Optimal solution found, best_max_dist: ", best_max_dist)
         results = {
             solver_name: {
@@ -123,78 +75,28 @@ def main_mip(instance):
                 "sol": best_paths
             }
         }
-        # Prepare directories if they don't exist yet
-        if not os.path.exists("res"):
-            os.mkdir("res")
-        if not os.path.exists(os.path.join("res", "MIP")):
-            os.mkdir(os.path.join("res", "MIP"))
-        
-        results_paths = f"res/MIP/inst{instance}.json"
-    
-        # Read existing data from the json
-        if os.path.exists(results_paths):
-            with open(results_paths, "r") as f:
-                loaded_data = json.load(f)
-        else:
-            loaded_data = dict()
-        
-        for key in results.keys():
-            loaded_data[key] = results[key]
-
-        # Creates JSON file with associated data
-        with open(results_paths, "w") as json_file:
-            json.dump(loaded_data, json_file, indent=4)
+        save_results(results, "MIP", instance)
         
     elif  status == pywraplp.Solver.FEASIBLE:
         is_optimal = False
         time = 300
-        for i in range(num_couriers):
-            for j in range(num_items+1):
-                    for k in range(num_items+1):
-                        if visit[i][j][k].solution_value() > 0:
-                            best_paths_dict[(i, j)] = k
-        best_paths = [[] for i in range(num_couriers)]
-        for i in range(num_couriers):
-            k = num_items
-            while k != num_items or len(best_paths[i]) == 0:
-                if (i, k) in best_paths_dict.keys():
-                    if best_paths_dict[(i, k)] != num_items:
-                        best_paths[i].append(best_paths_dict[(i, k)] + 1)
-                    k = best_paths_dict[(i, k)]
-                else:
-                    break
+        best_paths = routes_from_arcs(visit)
         
-        best_max_dist = int(max_distance.solution_value())
-        print("Feasible solution found, best_max_dist: ", best_max_dist)
+        best_max_dist = int(round(values[model["max_distance"]]))
+        # The distances are integers, so the bound of the search rounds up (with the lazy formulation it is
+        # the bound of the last relaxation, without some subtour cuts, still a lower bound)
+        best_bound = math.ceil(solver.Objective().BestBound() - 1e-6)
+        print("Feasible solution found, best_max_dist: ", best_max_dist, "bound: ", best_bound)
         results = {
             solver_name: {
                 "time": time,
                 "optimal": is_optimal,
                 "obj": best_max_dist,
-                "sol": best_paths
+                "sol": best_paths,
+                "bound": best_bound
             }
         }
-        # Prepare directories if they don't exist yet
-        if not os.path.exists("res"):
-            os.mkdir("res")
-        if not os.path.exists(os.path.join("res", "MIP")):
-            os.mkdir(os.path.join("res", "MIP"))
-        
-        results_paths = f"res/MIP/inst{instance}.json"
-    
-        # Read existing data from the json
-        if os.path.exists(results_paths):
-            with open(results_paths, "r") as f:
-                loaded_data = json.load(f)
-        else:
-            loaded_data = dict()
-        
-        for key in results.keys():
-            loaded_data[key] = results[key]
-
-        # Creates JSON file with associated data
-        with open(results_paths, "w") as json_file:
-            json.dump(loaded_data, json_file, indent=4)
+        save_results(results, "MIP", instance)
             
     else:
         is_optimal = False
@@ -208,30 +110,10 @@ def main_mip(instance):
                 "sol": "N/A"
             }
         }
-        # Prepare directories if they don't exist yet
-        if not os.path.exists("res"):
-            os.mkdir("res")
-        if not os.path.exists(os.path.join("res", "MIP")):
-            os.mkdir(os.path.join("res", "MIP"))
-        
-        results_paths = f"res/MIP/inst{instance}.json"
-    
-        # Read existing data from the json
-        if os.path.exists(results_paths):
-            with open(results_paths, "r") as f:
-                loaded_data = json.load(f)
-        else:
-            loaded_data = dict()
-        
-        for key in results.keys():
-            loaded_data[key] = results[key]
-
-        # Creates JSON file with associated data
-        with open(results_paths, "w") as json_file:
-            json.dump(loaded_data, json_file, indent=4)
+        save_results(results, "MIP", instance)
     
     # Free memory by deleting variables
-    del visit, load, u, max_distance
+    del visit, values, model
     del solver
     del num_couriers, num_items, courier_size, item_size, distances
     gc.collect()
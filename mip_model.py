@@ -0,0 +1,701 @@
+import os
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+
+# The MIP model is stored as NumPy arrays: bounds, objective and integrality of the columns,
+# bounds of the rows and the constraint matrix in CSR format, so that it can be built once
+# and loaded in bulk by every solver.
+
+def new_model():
+
+    return {
+        "num_cols": 0,
+        "col_lower": [],
+        "col_upper": [],
+        "integrality": [],
+        "num_rows": 0,
+        "row_index": [],
+        "col_index": [],
+        "value": [],
+        "row_lower": [],
+        "row_upper": []
+    }
+
+
+def add_variables(model, shape, lb, ub, integer=True):
+
+    size = int(np.prod(shape))
+
+    # Return the column indices of the new variables, with the given shape
+    index = np.arange(model["num_cols"], model["num_cols"] + size, dtype=np.int32).reshape(shape)
+    model["col_lower"].append(np.broadcast_to(np.asarray(lb, dtype=np.float64), shape).ravel())
+    model["col_upper"].append(np.broadcast_to(np.asarray(ub, dtype=np.float64), shape).ravel())
+    model["integrality"].append(np.full(size, 1 if integer else 0, dtype=np.int32))
+    model["num_cols"] += size
+
+    return index
+
+
+def add_rows(model, cols, values, lower, upper):
+
+    # One row for each line of cols, with the coefficients in the matching line of values
+    cols = np.asarray(cols, dtype=np.int32)
+    num_rows, width = cols.shape
+    values = np.broadcast_to(np.asarray(values, dtype=np.float64), cols.shape)
+
+    rows = np.repeat(np.arange(model["num_rows"], model["num_rows"] + num_rows, dtype=np.int32), width)
+    model["row_index"].append(rows)
+    model["col_index"].append(cols.ravel())
+    model["value"].append(values.ravel())
+    model["row_lower"].append(np.broadcast_to(np.asarray(lower, dtype=np.float64), num_rows))
+    model["row_upper"].append(np.broadcast_to(np.asarray(upper, dtype=np.float64), num_rows))
+    model["num_rows"] += num_rows
+
+    return None
+
+
+def finalize_model(model, objective):
+
+    rows = np.concatenate(model["row_index"])
+    cols = np.concatenate(model["col_index"])
+    values = np.concatenate(model["value"])
+
+    # Drop the zero coefficients (e.g. the null distances in the distance rows)
+    nonzero = values != 0
+    rows, cols, values = rows[nonzero], cols[nonzero], values[nonzero]
+
+    # The rows are added in order, so the entries are already sorted by row
+    start = np.zeros(model["num_rows"] + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=model["num_rows"]), out=start[1:])
+
+    model["col_cost"] = np.asarray(objective, dtype=np.float64)
+    model["col_lower"] = np.concatenate(model["col_lower"])
+    model["col_upper"] = np.concatenate(model["col_upper"])
+    model["integrality"] = np.concatenate(model["integrality"])
+    model["row_lower"] = np.concatenate(model["row_lower"])
+    model["row_upper"] = np.concatenate(model["row_upper"])
+    model["a_start"] = start
+    model["a_index"] = cols
+    model["a_value"] = values
+    del model["row_index"], model["col_index"], model["value"]
+
+    return model
+
+
+def build_mtz_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub, mtz=True):
+
+    m = num_couriers
+    n = num_items
+    depot = num_items
+    distances = np.asarray(distances, dtype=np.float64)
+
+    model = new_model()
+
+    # ----------Variables----------
+
+    # No self-loop on the items: their visit variables are fixed to 0
+    visit_upper = np.ones((m, n + 1, n + 1))
+    visit_upper[:, np.arange(n), np.arange(n)] = 0
+
+    visit = add_variables(model, (m, n + 1, n + 1), 0, visit_upper)
+    load = add_variables(model, (m, n), 0, 1)
+    max_distance = add_variables(model, (), lb, ub)
+    if mtz:
+        order = add_variables(model, (m, n + 1), 0, np.inf)
+
+    # ----------Constraints----------
+
+    # Each item is carried by exactly one courier
+    add_rows(model, load.T, 1, 1, 1)
+
+    # Each item is left and reached exactly once
+    add_rows(model, visit[:, :n, :].transpose(1, 0, 2).reshape(n, -1), 1, 1, 1)
+    add_rows(model, visit[:, :, :n].transpose(2, 0, 1).reshape(n, -1), 1, 1, 1)
+
+    # For each item and courier, the arcs leaving it and the ones reaching it (the self-loop cancels out)
+    leaving = visit[:, :n, :].transpose(1, 0, 2)
+    reaching = visit[:, :, :n].transpose(2, 0, 1)
+    other = np.arange(n + 1)[None, None, :] != np.arange(n)[:, None, None]
+    other = np.broadcast_to(other, leaving.shape)
+    leaving_others = leaving[other].reshape(n * m, n)
+    reaching_others = reaching[other].reshape(n * m, n)
+    add_rows(model, np.hstack([leaving_others, reaching_others]), np.repeat([1, -1], n), 0, 0)
+
+    # Consistent visits: a courier leaves and reaches an item only if it carries it
+    load_column = load.T.reshape(n * m, 1)
+    add_rows(model, np.hstack([leaving.reshape(n * m, n + 1), load_column]), np.append(np.ones(n + 1), -1), 0, 0)
+    add_rows(model, np.hstack([reaching.reshape(n * m, n + 1), load_column]), np.append(np.ones(n + 1), -1), 0, 0)
+
+    # Capacity
+    add_rows(model, load, np.asarray(item_size, dtype=np.float64)[None, :], -np.inf, np.asarray(courier_size, dtype=np.float64))
+
+    # Each courier starts and ends at the depot exactly once
+    add_rows(model, visit[:, depot, :n], 1, 1, 1)
+    add_rows(model, visit[:, :n, depot], 1, 1, 1)
+
+    # The distance of each tour is at most max_distance
+    tour = np.hstack([visit.reshape(m, -1), np.full((m, 1), max_distance)])
+    add_rows(model, tour, np.append(distances.ravel(), -1)[None, :], -np.inf, 0)
+
+    # MTZ: order[k][i] - order[k][j] + n * visit[k][i][j] <= n - 1 for each item i and node j != i
+    # (without them the subtours are cut lazily, see solve_with_subtour_cuts)
+    if mtz:
+        i, j = np.nonzero(np.arange(n)[:, None] != np.arange(n + 1)[None, :])
+        rows = np.stack([
+            order[:, i],
+            order[:, j],
+            visit[:, i, j]
+        ], axis=-1).reshape(-1, 3)
+        add_rows(model, rows, [1, -1, n], -np.inf, n - 1)
+
+    # Minimise the longest tour
+    objective = np.zeros(model["num_cols"])
+    objective[max_distance] = 1
+    finalize_model(model, objective)
+
+    model["formulation"] = "mtz" if mtz else "lazy"
+    model["visit"] = visit
+    model["load"] = load
+    if mtz:
+        model["order"] = order
+    model["max_distance"] = int(max_distance)
+
+    return model
+
+
+def build_two_index_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub):
+
+    m = num_couriers
+    n = num_items
+    depot = num_items
+    distances = np.asarray(distances, dtype=np.float64)
+
+    model = new_model()
+
+    # ----------Variables----------
+
+    # arc[i][j]: some courier goes from node i to node j, no self-loops
+    arc_upper = 1 - np.eye(n + 1)
+    arc = add_variables(model, (n + 1, n + 1), 0, arc_upper)
+
+    # assign[k][i]: courier k carries item i, start[k][i]: item i is the first one of courier k
+    assign = add_variables(model, (m, n), 0, 1)
+    start = add_variables(model, (m, n), 0, 1)
+
+    # Index of the courier carrying each item, order of the item in its tour and distance travelled when reaching it
+    label = add_variables(model, n, 0, m - 1)
+    order = add_variables(model, n, 1, n)
+    arrival = add_variables(model, n, 0, ub, integer=False)
+
+    max_distance = add_variables(model, (), lb, ub)
+
+    items = np.arange(n)
+    i, j = np.nonzero(~np.eye(n, dtype=bool))
+
+    # ----------Constraints----------
+
+    # Each item is carried by exactly one courier, within the capacity
+    add_rows(model, assign.T, 1, 1, 1)
+    add_rows(model, assign, np.asarray(item_size, dtype=np.float64)[None, :], -np.inf, np.asarray(courier_size, dtype=np.float64))
+
+    # Each item is left and reached exactly once, the depot once per courier
+    add_rows(model, arc[:n, :], 1, 1, 1)
+    add_rows(model, arc[:, :n].T, 1, 1, 1)
+    add_rows(model, arc[depot, :n][None, :], 1, m, m)
+    add_rows(model, arc[:n, depot][None, :], 1, m, m)
+
+    # Each courier starts exactly once, from an item it carries, and every tour leaving the depot belongs to a courier
+    add_rows(model, start, 1, 1, 1)
+    add_rows(model, np.stack([start, assign], axis=-1).reshape(-1, 2), [1, -1], -np.inf, 0)
+    add_rows(model, np.hstack([start.T, arc[depot, :n, None]]), np.append(np.ones(m), -1), 0, 0)
+
+    # label[i] is the index of the courier carrying item i
+    add_rows(model, np.hstack([label[:, None], assign.T]), np.append(1, -np.arange(m)), 0, 0)
+
+    # Consecutive items have the same courier: label[i] - label[j] + (m - 1) * arc[i][j] <= m - 1 and vice versa
+    add_rows(model, np.stack([label[i], label[j], arc[i, j]], axis=-1), [1, -1, m - 1], -np.inf, m - 1)
+    add_rows(model, np.stack([label[j], label[i], arc[i, j]], axis=-1), [1, -1, m - 1], -np.inf, m - 1)
+
+    # MTZ on the items only: order[i] - order[j] + n * arc[i][j] <= n - 1
+    add_rows(model, np.stack([order[i], order[j], arc[i, j]], axis=-1), [1, -1, n], -np.inf, n - 1)
+
+    # Distance flow: arrival[j] >= arrival[i] + d[i][j] when arc[i][j] is used (big-M = ub + d[i][j])
+    add_rows(model, np.stack([arrival[j], arrival[i], arc[i, j]], axis=-1),
+             np.stack([np.ones(len(i)), -np.ones(len(i)), -(ub + distances[i, j])], axis=-1), -ub, np.inf)
+    add_rows(model, np.stack([arrival, arc[depot, :n]], axis=-1),
+             np.stack([np.ones(n), -distances[depot, :n]], axis=-1), 0, np.inf)
+
+    # The tour ending after item i is at most max_distance
+    add_rows(model, np.stack([np.full(n, max_distance), arrival, arc[:n, depot]], axis=-1),
+             np.stack([np.ones(n), -np.ones(n), -(ub + distances[:n, depot])], axis=-1), -ub, np.inf)
+
+    # Minimise the longest tour
+    objective = np.zeros(model["num_cols"])
+    objective[max_distance] = 1
+    finalize_model(model, objective)
+
+    model["formulation"] = "two_index"
+    model["num_couriers"] = m
+    model["distances"] = distances
+    model["arc"] = arc
+    model["assign"] = assign
+    model["start"] = start
+    model["label"] = label
+    model["order"] = order
+    model["arrival"] = arrival
+    model["max_distance"] = int(max_distance)
+
+    return model
+
+
+def build_lazy_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub):
+
+    return build_mtz_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub, mtz=False)
+
+
+FORMULATIONS = {
+    "mtz": build_mtz_model,
+    "two_index": build_two_index_model,
+    "lazy": build_lazy_model
+}
+
+
+def build_model(formulation, num_couriers, num_items, courier_size, item_size, distances, lb, ub):
+
+    if formulation not in FORMULATIONS:
+        raise ValueError(f"Formulation {formulation} not available, use one of: {', '.join(FORMULATIONS)}.")
+
+    return FORMULATIONS[formulation](num_couriers, num_items, courier_size, item_size, distances, lb, ub)
+
+
+def start_values(model, routes, obj):
+
+    # Column values of the solution given by the routes (0-based items), as a MIP start
+    values = np.zeros(model["num_cols"])
+
+    if "visit" in model:
+        num_items = model["load"].shape[1]
+        for k, route in enumerate(routes):
+            path = [num_items] + list(route) + [num_items]
+            values[model["visit"][k, path[:-1], path[1:]]] = 1
+            values[model["load"][k, route]] = 1
+            if "order" in model:
+                values[model["order"][k]] = num_items
+                values[model["order"][k, route]] = np.arange(1, len(route) + 1)
+                values[model["order"][k, num_items]] = len(route) + 1
+
+    else:
+        num_items = len(model["label"])
+        distances = model["distances"]
+        for k, route in enumerate(routes):
+            path = [num_items] + list(route) + [num_items]
+            values[model["arc"][path[:-1], path[1:]]] = 1
+            values[model["assign"][k, route]] = 1
+            values[model["start"][k, route[0]]] = 1
+            values[model["label"][route]] = k
+            values[model["order"][route]] = np.arange(1, len(route) + 1)
+            values[model["arrival"][route]] = np.cumsum(distances[path[:-2], path[1:-1]])
+
+    values[model["max_distance"]] = obj
+
+    return values
+
+
+def courier_arcs(model, values):
+
+    # Value of visit[k][i][j] (courier k goes from i to j) in the solution, whatever the formulation
+    if "visit" in model:
+        return values[model["visit"]]
+
+    num_items = len(model["label"])
+    arcs = values[model["arc"]]
+    couriers = np.argmax(values[model["assign"]], axis=0)
+
+    visit = np.zeros((model["num_couriers"], num_items + 1, num_items + 1))
+    visit[couriers, np.arange(num_items), :] = arcs[:num_items, :]
+    visit[:, num_items, :num_items] = values[model["start"]]
+
+    return visit
+
+
+
+# ----------Subtour elimination----------
+
+def find_subtours(model, values):
+
+    visit = courier_arcs(model, values) > 0.5
+    num_items = visit.shape[1] - 1
+
+    subtours = set()
+    for k in range(visit.shape[0]):
+        successor = dict(zip(*(index.tolist() for index in np.nonzero(visit[k]))))
+
+        # Nodes on the tour starting from the depot
+        on_tour = set()
+        node = num_items
+        while node in successor and successor[node] not in on_tour and successor[node] != num_items:
+            node = successor[node]
+            on_tour.add(node)
+
+        # Any other item left by the courier is on a cycle not passing through the depot
+        for item in successor:
+            if item == num_items or item in on_tour:
+                continue
+            cycle = [item]
+            node = successor[item]
+            while node != item and node not in cycle and node in successor:
+                cycle.append(node)
+                node = successor[node]
+            on_tour.update(cycle)
+            subtours.add(tuple(sorted(cycle)))
+
+    return [list(subtour) for subtour in subtours]
+
+
+def subtour_cuts(model, subtours):
+
+    # No courier can use as many arcs inside a set of items as the items in it
+    cuts = []
+    for subtour in subtours:
+        cols = model["visit"][:, subtour][:, :, subtour].ravel()
+        cuts.append((cols, len(subtour) - 1))
+
+    return cuts
+
+
+def append_rows(model, cuts):
+
+    # Add the cuts (sum of the columns <= upper) to the finalised model
+    for cols, upper in cuts:
+        model["a_index"] = np.concatenate([model["a_index"], cols.astype(np.int32)])
+        model["a_value"] = np.concatenate([model["a_value"], np.ones(len(cols))])
+        model["a_start"] = np.append(model["a_start"], model["a_start"][-1] + len(cols)).astype(np.int32)
+        model["row_lower"] = np.append(model["row_lower"], -np.inf)
+        model["row_upper"] = np.append(model["row_upper"], upper)
+        model["num_rows"] += 1
+
+    return None
+
+
+def solve_with_subtour_cuts(model, solve, add_cuts, time_limit, start=None):
+
+    # solve(time_left) returns the status ("Optimal", "Feasible" or "Not Solved") and the values of the columns,
+    # add_cuts(cuts) adds the cuts to the solver (None if the solver is built again from the model at each solve).
+    # The model is solved again until no subtour is left.
+    start_time = time.time()
+    num_cuts = 0
+
+    while True:
+        status, values = solve(max(time_limit - (time.time() - start_time), 1))
+
+        if status == "Not Solved":
+            break
+
+        subtours = find_subtours(model, values)
+        if not subtours:
+            break
+
+        # The relaxation wasn't solved to optimality in the time left: its incumbent is not a valid solution
+        if status != "Optimal" or time.time() - start_time >= time_limit:
+            status = "Not Solved"
+            break
+
+        num_cuts += len(subtours)
+        print(f"Found {len(subtours)} subtours, adding the cuts ({num_cuts} so far) and solving again...")
+        cuts = subtour_cuts(model, subtours)
+        append_rows(model, cuts)
+        if add_cuts is not None:
+            add_cuts(cuts)
+
+    # Fall back to the initial solution, which is always valid
+    if status == "Not Solved" and start is not None:
+        status, values = "Feasible", start
+
+    return status, values
+
+# ----------Emitters----------
+
+def to_highs(model):
+
+    import highspy
+
+    highs = highspy.Highs()
+
+    # Rowwise matrix format (2), minimisation (1), no offset
+    highs.passModel(model["num_cols"], model["num_rows"], len(model["a_value"]), 2, 1, 0.0,
+                    model["col_cost"], model["col_lower"], model["col_upper"],
+                    model["row_lower"], model["row_upper"],
+                    model["a_start"], model["a_index"], model["a_value"],
+                    model["integrality"])
+
+    return highs
+
+
+def highs_add_rows(highs, cuts):
+
+    # Cuts (sum of the columns <= upper) in the rowwise format of addRows
+    starts = np.cumsum([0] + [len(cols) for cols, _ in cuts[:-1]])
+    index = np.concatenate([cols for cols, _ in cuts]).astype(np.int32)
+    highs.addRows(len(cuts), np.full(len(cuts), -np.inf), np.array([upper for _, upper in cuts], dtype=np.float64),
+                  len(index), starts.astype(np.int32), index, np.ones(len(index)))
+
+    return None
+
+
+def varint_sizes(values):
+
+    # Bytes of each (non negative) value as a protobuf varint, 7 bits per byte
+    return 1 + np.searchsorted(1 << (7 * np.arange(1, 10, dtype=np.int64)), values, side="right")
+
+
+def put_varints(out, positions, values, sizes):
+
+    for k in range(int(sizes.max(initial=0))):
+        written = sizes > k
+        more = np.where(sizes[written] > k + 1, 0x80, 0)
+        out[positions[written] + k] = ((values[written] >> (7 * k)) & 0x7f) | more
+
+    return None
+
+
+def put_doubles(out, positions, values):
+
+    # Little-endian doubles, as protobuf stores them
+    out[positions[:, None] + np.arange(8)] = np.ascontiguousarray(values, dtype="<f8").view(np.uint8).reshape(-1, 8)
+
+    return None
+
+
+def mpmodel_variables(model):
+
+    # MPModelProto.variable (field 3) records: lower_bound (1), upper_bound (2), objective_coefficient (3)
+    # and is_integer (4), 29 bytes each, so that every column is written at a fixed offset
+    positions = np.arange(model["num_cols"], dtype=np.int64) * 31
+    out = np.zeros(model["num_cols"] * 31, dtype=np.uint8)
+
+    out[positions] = 0x1a
+    out[positions + 1] = 29
+    for offset, tag, values in ((2, 0x09, model["col_lower"]), (11, 0x11, model["col_upper"]), (20, 0x19, model["col_cost"])):
+        out[positions + offset] = tag
+        put_doubles(out, positions + offset + 1, values)
+    out[positions + 29] = 0x20
+    out[positions + 30] = model["integrality"] != 0
+
+    return out.tobytes()
+
+
+def mpmodel_constraints(model, first, last):
+
+    # MPModelProto.constraint (field 4) records of the rows [first, last): lower_bound (2), upper_bound (3)
+    # and the packed var_index (6) and coefficient (7) of the row, straight from the CSR arrays
+    starts = model["a_start"][first:last + 1].astype(np.int64) - model["a_start"][first]
+    nnz = starts[-1]
+    index = model["a_index"][model["a_start"][first]:][:nnz].astype(np.int64)
+    value = model["a_value"][model["a_start"][first]:][:nnz]
+    counts = np.diff(starts)
+    rows = np.repeat(np.arange(last - first), counts)
+
+    # Bytes of the packed indices of each row, and offset of each index in its row
+    index_sizes = varint_sizes(index)
+    index_ends = np.concatenate(([0], np.cumsum(index_sizes)))
+    index_bytes = index_ends[starts[1:]] - index_ends[starts[:-1]]
+    index_offsets = index_ends[:-1] - index_ends[starts[:-1]][rows]
+
+    index_size_bytes = varint_sizes(index_bytes)
+    value_size_bytes = varint_sizes(8 * counts)
+    length = 18 + 1 + index_size_bytes + index_bytes + 1 + value_size_bytes + 8 * counts
+    length_bytes = varint_sizes(length)
+    record = 1 + length_bytes + length
+
+    positions = np.concatenate(([0], np.cumsum(record)[:-1]))
+    out = np.zeros(int(record.sum()), dtype=np.uint8)
+
+    out[positions] = 0x22
+    put_varints(out, positions + 1, length, length_bytes)
+    bounds = positions + 1 + length_bytes
+    out[bounds] = 0x11
+    put_doubles(out, bounds + 1, model["row_lower"][first:last])
+    out[bounds + 9] = 0x19
+    put_doubles(out, bounds + 10, model["row_upper"][first:last])
+
+    indices = bounds + 18
+    out[indices] = 0x32
+    put_varints(out, indices + 1, index_bytes, index_size_bytes)
+    put_varints(out, (indices + 1 + index_size_bytes)[rows] + index_offsets, index, index_sizes)
+
+    values = indices + 1 + index_size_bytes + index_bytes
+    out[values] = 0x3a
+    put_varints(out, values + 1, 8 * counts, value_size_bytes)
+    put_doubles(out, (values + 1 + value_size_bytes)[rows] + 8 * (np.arange(nnz) - starts[:-1][rows]), value)
+
+    return out.tobytes()
+
+
+def to_pywraplp(model, solver_name="SCIP", start=None, block_size=1 << 20):
+
+    from ortools.linear_solver import pywraplp
+    from ortools.linear_solver import linear_solver_pb2
+
+    # The MPModelProto is written in its wire format with NumPy, a block of nonzeros at a time to bound the
+    # memory, and parsed at once instead of being filled one variable and one row at a time
+    chunks = [mpmodel_variables(model)]
+    first = 0
+    while first < model["num_rows"]:
+        last = int(np.searchsorted(model["a_start"], model["a_start"][first] + block_size, side="right")) - 1
+        last = min(max(last, first + 1), model["num_rows"])
+        chunks.append(mpmodel_constraints(model, first, last))
+        first = last
+
+    proto = linear_solver_pb2.MPModelProto()
+    proto.ParseFromString(b"".join(chunks))
+    del chunks
+
+    if start is not None:
+        proto.solution_hint.var_index.extend(range(model["num_cols"]))
+        proto.solution_hint.var_value.extend(np.asarray(start, dtype=np.float64).tolist())
+
+    solver = pywraplp.Solver.CreateSolver(solver_name)
+    error = solver.LoadModelFromProto(proto)
+    if error:
+        raise ValueError(f"Could not load the model in {solver_name}: {error}")
+
+    return solver
+
+
+def pywraplp_values(solver):
+
+    from ortools.linear_solver import linear_solver_pb2
+
+    # Read all the variable values at once
+    response = linear_solver_pb2.MPSolutionResponse()
+    solver.FillSolutionResponseProto(response)
+
+    return np.array(response.variable_value)
+
+
+def pywraplp_add_rows(solver, cuts):
+
+    variables = solver.variables()
+    for cols, upper in cuts:
+        constraint = solver.Constraint(-solver.infinity(), upper)
+        for col in cols.tolist():
+            constraint.SetCoefficient(variables[col], 1)
+
+    return None
+
+
+def to_cplex(model, start=None):
+
+    import cplex
+
+    problem = cplex.Cplex()
+
+    lower = np.maximum(model["col_lower"], -cplex.infinity)
+    upper = np.minimum(model["col_upper"], cplex.infinity)
+    types = "".join(np.where(model["integrality"] == 1, "I", "C"))
+    problem.variables.add(obj=model["col_cost"].tolist(), lb=lower.tolist(), ub=upper.tolist(), types=types)
+
+    # Equality, less-equal, greater-equal or ranged row depending on which bounds are finite
+    row_lower, row_upper = model["row_lower"], model["row_upper"]
+    senses = np.where(row_lower == row_upper, "E",
+                      np.where(np.isinf(row_lower), "L",
+                               np.where(np.isinf(row_upper), "G", "R")))
+    rhs = np.where(np.isinf(row_lower), row_upper, row_lower)
+    ranges = np.where(senses == "R", row_upper - row_lower, 0)
+    problem.linear_constraints.add(senses="".join(senses), rhs=rhs.tolist(), range_values=ranges.tolist())
+
+    rows = np.repeat(np.arange(model["num_rows"]), np.diff(model["a_start"]))
+    problem.linear_constraints.set_coefficients(zip(rows.tolist(), model["a_index"].tolist(), model["a_value"].tolist()))
+
+    problem.objective.set_sense(problem.objective.sense.minimize)
+
+    if start is not None:
+        problem.MIP_starts.add(cplex.SparsePair(ind=list(range(model["num_cols"])), val=np.asarray(start).tolist()),
+                               problem.MIP_starts.effort_level.repair)
+
+    return problem
+
+
+def cplex_add_rows(problem, cuts):
+
+    import cplex
+
+    problem.linear_constraints.add(lin_expr=[cplex.SparsePair(ind=cols.tolist(), val=[1.0] * len(cols)) for cols, _ in cuts],
+                                   senses="L" * len(cuts), rhs=[float(upper) for _, upper in cuts])
+
+    return None
+
+
+def write_cbc_solution(path, values):
+
+    # CBC solution file format, as read by the -mips option
+    with open(path, "w") as file:
+        file.write("Stopped on iterations - objective value 0\n")
+        for col, value in enumerate(values.tolist()):
+            file.write(f"{col} c{col} {value:.12g} 0\n")
+
+    return None
+
+
+def read_cbc_solution(path, num_cols):
+
+    values = np.zeros(num_cols)
+
+    if not os.path.exists(path):
+        return "Not Solved", values
+
+    with open(path) as file:
+        header = file.readline()
+
+        for line in file:
+            fields = line.split()
+            if fields and fields[0] == "**":
+                fields = fields[1:]
+            # The rows (r<i>) come before the columns (c<i>)
+            if len(fields) >= 3 and fields[1].startswith("c") and fields[1][1:].isdigit():
+                values[int(fields[1][1:])] = float(fields[2])
+
+    if header.startswith("Optimal"):
+        status = "Optimal"
+    elif header.startswith("Stopped") and "no integer solution" not in header and "objective value" in header:
+        status = "Feasible"
+    elif "nfeasible" in header:
+        status = "Infeasible"
+    else:
+        status = "Not Solved"
+
+    return status, values
+
+
+def solve_cbc(model, time_limit, start=None):
+
+    import pulp as plp
+
+    # CBC is the binary shipped with PuLP, the model is passed to it as an MPS file written by HiGHS
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mps_path = os.path.join(tmp_dir, "model.mps")
+        solution_path = os.path.join(tmp_dir, "model.sol")
+
+        highs = to_highs(model)
+        highs.setOptionValue("output_flag", False)
+        highs.writeModel(mps_path)
+        del highs
+
+        command = [plp.PULP_CBC_CMD().path, mps_path, "-sec", str(time_limit), "-timeMode", "elapsed"]
+        if start is not None:
+            start_path = os.path.join(tmp_dir, "start.mst")
+            write_cbc_solution(start_path, start)
+            command += ["-mips", start_path]
+        command += ["-branch", "-printingOptions", "all", "-solution", solution_path]
+
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            process.wait()
+        except KeyboardInterrupt:
+            # CBC got the same SIGINT: it stops the search and writes its incumbent
+            process.wait()
+
+        return read_cbc_solution(solution_path, model["num_cols"])
@@ -0,0 +1,195 @@
+import os
+import sys
+import time
+import signal
+import resource
+import multiprocessing
+from multiprocessing.connection import wait
+from math import floor
+from utils import load_result, save_results
+
+
+def make_job(name, target, args, approach, instance, key):
+
+    # A job is one (approach, instance) pair: the function to run and where it stores its result
+    return {
+        "name": name,
+        "target": target,
+        "args": args,
+        "approach": approach,
+        "instance": instance,
+        "key": key
+    }
+
+
+def limit_memory(memory_limit):
+
+    # Cap the address space of the worker, the solvers it spawns inherit the same limit
+    if memory_limit is not None:
+        limit = int(memory_limit * 1024 ** 3)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def run_job(job, memory_limit, log_dir, conn, new_group=False):
+
+    limit_memory(memory_limit)
+
+    # Run the job (and its subprocesses) in its own process group, so that it can be stopped as a whole
+    if new_group:
+        os.setpgid(0, 0)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    # Redirect the output of the job (and of its subprocesses) to its own log file
+    if log_dir is not None:
+        log_path = os.path.join(log_dir, job["name"].replace(" ", "_") + ".log")
+        log_file = open(log_path, "w")
+        os.dup2(log_file.fileno(), sys.stdout.fileno())
+        os.dup2(log_file.fileno(), sys.stderr.fileno())
+
+    job["target"](*job["args"])
+    sys.stdout.flush()
+
+    # Send back the entry the job has just written
+    conn.send(load_result(job["approach"], job["instance"], job["key"]))
+    conn.close()
+
+
+def unsolved_result(approach):
+
+    return {
+        "time": 300,
+        "optimal": "false" if approach in ("CP", "SMT") else False,
+        "obj": 0,
+        "sol": "N/A"
+    }
+
+
+def start_job(job, memory_limit=None, log_dir=None, new_group=False):
+
+    # Reset the entry of the job before it starts, so that whatever is found under its key afterwards was
+    # written by this run and not left by a previous one
+    save_results({job["key"]: unsolved_result(job["approach"])}, job["approach"], job["instance"])
+
+    parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=run_job, args=(job, memory_limit, log_dir, child_conn, new_group))
+    process.start()
+    child_conn.close()
+
+    return process, parent_conn
+
+
+def collect_job(job, process, conn):
+
+    process.join()
+
+    result = None
+    if process.exitcode == 0 and conn.poll():
+        result = conn.recv()
+    conn.close()
+
+    # The worker crashed or was killed (e.g. it exceeded the memory cap): keep the incumbent it streamed
+    # to res before dying, if any, otherwise the entry is still the unsolved one written at the start
+    if result is None:
+        print(f"Job {job['name']} terminated with exit code {process.exitcode}")
+        result = load_result(job["approach"], job["instance"], job["key"])
+
+    if result is None:
+        result = unsolved_result(job["approach"])
+        save_results({job["key"]: result}, job["approach"], job["instance"])
+
+    return result
+
+
+def run_jobs(jobs, num_workers, memory_limit=None, log_dir="logs"):
+
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+
+    pending = list(jobs)
+    running = {}
+    num_solved = 0
+    num_optimal = 0
+
+    start = time.time()
+
+    while pending or running:
+
+        # Fill the free workers
+        while pending and len(running) < num_workers:
+            job = pending.pop(0)
+            process, conn = start_job(job, memory_limit, log_dir)
+            running[process.sentinel] = (job, process, conn)
+
+        # Wait for at least one job to finish
+        for sentinel in wait(list(running.keys())):
+            job, process, conn = running.pop(sentinel)
+            result = collect_job(job, process, conn)
+
+            if result["sol"] != "N/A":
+                num_solved += 1
+            if result["optimal"] in (True, "true"):
+                num_optimal += 1
+
+            print(f"[{len(jobs) - len(pending) - len(running)}/{len(jobs)}] {job['name']}: obj {result['obj']}, optimal {result['optimal']}, time {result['time']}")
+
+    elapsed = time.time() - start
+
+    print("----------------------------------------------------------------")
+    print(f"Jobs completed: {len(jobs)} in {floor(elapsed)} seconds using {num_workers} workers")
+    print(f"Solved instances: {num_solved}, optimal: {num_optimal}")
+    print(f"Throughput: {num_solved / (elapsed / 3600):.1f} solved instances per hour")
+
+    return num_solved, elapsed
+
+
+def signal_job(process, signum):
+
+    try:
+        os.killpg(process.pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def race_jobs(jobs, grace_period=30, log_dir="logs"):
+
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+
+    running = {}
+    for job in jobs:
+        process, conn = start_job(job, log_dir=log_dir, new_group=True)
+        running[process.sentinel] = (job, process, conn)
+
+    results = {}
+    winner = None
+    deadline = None
+
+    try:
+        while running:
+            timeout = None if deadline is None else max(0, deadline - time.time())
+            ready = wait(list(running.keys()), timeout)
+
+            # The stopped jobs didn't finish within the grace period: kill them
+            if not ready:
+                for job, process, conn in running.values():
+                    signal_job(process, signal.SIGKILL)
+                deadline = None
+                continue
+
+            for sentinel in ready:
+                job, process, conn = running.pop(sentinel)
+                results[job["name"]] = collect_job(job, process, conn)
+                print(f"{job['name']} finished: obj {results[job['name']]['obj']}, optimal {results[job['name']]['optimal']}")
+
+                # First proof of optimality: interrupt the others, they stop and store their incumbent
+                if winner is None and results[job["name"]]["optimal"] in (True, "true"):
+                    winner = job["name"]
+                    print(f"{winner} proved optimality, stopping the other jobs")
+                    for other_job, other_process, other_conn in running.values():
+                        signal_job(other_process, signal.SIGINT)
+                    deadline = time.time() + grace_period
+    finally:
+        for job, process, conn in running.values():
+            signal_job(process, signal.SIGKILL)
+
+    return winner, results
@@ -1,150 +1,159 @@
 import os
+import re
+import shutil
 from timeit import default_timer as timer
 import math
-import json
 from math import floor
-from utils import import_data
+import numpy as np
+from utils import computeBounds, import_arrays, save_results, routes_from_successors
+from heuristic import construct_solution
+from formula_cache import lookup, store, temp_path
 from z3 import *
 
 
-def main_smt(instance):
-    
+# Size in MB of the SMT-LIB2 text beyond which the formula is not built
+SMT2_SIZE_LIMIT = int(os.environ.get("SMT2_SIZE_MB", 256))
+
+
+def main_smt(instance, search="bisection", encoding="lia", formulation="three_index", builder="smt2", dump=False, cache=True, strategy="default", threads=1):
+
     print("Running instance", instance)
 
     file_name = f"Instances/inst{instance}.dat"
-    
+
     timelimit = 300
     const_limit = 180
 
-    num_couriers, num_items, courier_size, item_size, distances = import_data(file_name)
+    num_couriers, num_items, courier_size, item_size, distances = import_arrays(file_name)
+    lb, ub = computeBounds(distances, num_couriers, num_items, courier_size, item_size)
 
-    print("Defining vars and adding constraints...")
+    if formulation == "successor" and encoding != "lia":
+        print("The successor model has only the lia encoding, using it.")
+        encoding = "lia"
 
-    # Define variables
-    visit = [[[Bool(f"visit_{i}_{j}_{k}") for k in range(num_items + 1)] for j in range(num_items + 1)] for i in range(num_couriers)]
-    load = [[Bool(f"load_{i}_{j}") for j in range(num_items)] for i in range(num_couriers)]
-    u = [[Int(f"u{i}_{j}") for j in range(num_items+1)] for i in range(num_couriers)]
+    if search not in SEARCHES:
+        raise ValueError(f"SMT search {search} not available, choose among {', '.join(SEARCHES)}.")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"SMT strategy {strategy} not available, choose among {', '.join(STRATEGIES)}.")
+    if strategy == "maxres" and search != "optimize":
+        print("The maxres strategy is an optimizer, using the optimize search.")
+        search = "optimize"
+    elif strategy in ("qflia", "card", "sat") and search == "optimize":
+        print(f"The {strategy} strategy is used only by the bisection, using it.")
+        search = "bisection"
+    if strategy in ("qflia", "sat") and formulation == "successor":
+        # The lookup tables of the successor model are uninterpreted functions, outside of both logics
+        print(f"The {strategy} strategy can't solve the successor model, using the default one.")
+        strategy = "default"
 
-    # Create solver instance
-    s = Optimize()
+    set_threads(threads)
+
+    solver_name = smt_key(search, encoding, formulation, strategy)
+
+    # The formulas built as text and the successor model are cached per instance, model and bounds
+    cacheable = cache and (formulation == "successor" or builder == "smt2")
+    cache_key = f"{formulation}_{encoding}_{lb}_{ub}"
+    cached_path, cached_build_time = lookup(file_name, cache_key) if cacheable else (None, None)
 
-    #----------constraints definition-------------
     start_time = timer()
     try:
+        if cached_path is not None:
+            model = load_smt_model(cached_path, search, formulation, num_couriers, num_items, strategy)
+            load_time = timer() - start_time
+            built = f", built in {cached_build_time:.2f} s" if cached_build_time is not None else ""
+            print(f"Formula loaded from the cache in {load_time:.2f} s{built}")
 
-        # Each item should be assigned to only one vehicle
-        for j in range(num_items):
-            s.add(Sum([If(load[i][j], 1, 0) for i in range(num_couriers)]) == 1)
-            if timer() - start_time > const_limit:
-                raise TimeoutError("Timeout reached while adding constraints")
-        
-        for i in range(num_items):
-            s.add(Sum([If(visit[k][i][j], 1, 0) for k in range(num_couriers) for j in range(num_items + 1)]) == 1)
-            if timer() - start_time > const_limit:
-                raise TimeoutError("Timeout reached while adding constraints")
-        
-        for i in range(num_items):
-            s.add(Sum([If(visit[k][j][i], 1, 0) for k in range(num_couriers) for j in range(num_items + 1)]) == 1)
-            if timer() - start_time > const_limit:
-                raise TimeoutError("Timeout reached while adding constraints")
-      
-        for i in range(num_items):
-            for k in range(num_couriers):
-                s.add(Sum([If(visit[k][i][j], 1,0) for j in range(num_items+1)]) == Sum([If(visit[k][j][i],1,0) for j in range(num_items + 1)]))
-                if timer() - start_time > const_limit:
-                   raise TimeoutError("Timeout reached while adding constraints")
+        else:
+            print("Defining vars and adding constraints...")
 
-        # Ensure consistent visits for each courier
-        for i in range(num_items):
-            for k in range(num_couriers):
-                s.add(Sum([If(visit[k][i][j],1,0) for j in range(num_items + 1)]) == load[k][i])
-                if timer() - start_time > const_limit:
-                   raise TimeoutError("Timeout reached while adding constraints")
-               
-        for i in range(num_items):
-            for k in range(num_couriers):
-                s.add(Sum([If(visit[k][j][i], 1,0) for j in range(num_items + 1)]) == load[k][i])    
-                if timer() - start_time > const_limit:
-                   raise TimeoutError("Timeout reached while adding constraints")
-
-        # MTZ constraint
-        for i in range(num_couriers):
-            for j in range(num_items + 1):
-                for k in range(num_items + 1):
-                    if j != num_items and j != k:
-                        s.add(u[i][j] - u[i][k] + num_items * If(visit[i][j][k],1,0) <= num_items - 1)
-                        if timer() - start_time > const_limit:
-                            raise TimeoutError("Timeout reached while adding constraints")
-
-        # Capacity constraint
-        for i in range(num_couriers):
-            s.add(Sum([If(load[i][j], item_size[j], 0) for j in range(num_items)]) <= courier_size[i])
-            if timer() - start_time > const_limit:
-                raise TimeoutError("Timeout reached while adding constraints")
-            
-        # Ensure no self-loop
-        for i in range(num_couriers):
-            s.add(Sum([If(visit[i][j][j], 1, 0) for j in range(num_items)]) == 0)
-            if timer() - start_time > const_limit:
-                raise TimeoutError("Timeout reached while adding constraints")
+            dump_path = None
+            if formulation == "successor":
+                model = build_successor_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub, search, const_limit, strategy)
+            elif builder == "smt2":
+                # The three-index model is generated as SMT-LIB2 text and parsed at once, optionally saved in smt2/
+                if dump:
+                    dump_path = os.path.join("smt2", f"inst{instance}_{encoding}.smt2")
+                elif cacheable:
+                    dump_path = temp_path()
+                model = build_smt2_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub, search, encoding, dump_path, strategy, const_limit)
+            else:
+                model = build_smt_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub, search, encoding, const_limit, strategy)
 
-        # Ensure each courier starts and ends at the depot exactly once
-        for k in range(num_couriers):
-            s.add(Sum([If(visit[k][num_items][i], 1, 0) for i in range(num_items)]) == 1)
-            s.add(Sum([If(visit[k][i][num_items], 1, 0) for i in range(num_items)]) == 1)
-            if timer() - start_time > const_limit:
-                raise TimeoutError("Timeout reached while adding constraints")
+            end_const = timer()
+            print(f"Constraints added in time {floor(end_const-start_time)}")
+
+            if cacheable:
+                cache_formula(file_name, cache_key, model, end_const - start_time, dump_path, keep_source=dump)
 
-        # Calculate the maximum distance traveled
-        max_dist = Int('max_dist')
-        for i in range(num_couriers):
-            s.add(Sum([If(visit[i][j][k], distances[j][k], 0) for j in range(num_items + 1) for k in range(num_items + 1)]) <= max_dist)
-            if timer() - start_time > const_limit:
-                raise TimeoutError("Timeout reached while adding constraints")
-      
-        end_const = timer()
-        print(f"Constraints added in time {floor(end_const-start_time)}")
-        
     except TimeoutError:
         print("Terminating constraint addition due to timeout.")
         optimal = "false"
         time = 300
-        
-        if not os.path.exists("res"):
-            os.mkdir("res")
-        if not os.path.exists(os.path.join("res", "SMT")):
-            os.mkdir(os.path.join("res", "SMT"))
-        
+
         results = {
-                "Z3": {
+                solver_name: {
                     "time": time,
                     "optimal": optimal,
                     "obj": 0,
                     "sol": "N/A"
                 }
         }
-        
-        results_paths = f"res/SMT/inst{instance}.json"
-        
-        # Read existing data from the json
-        if os.path.exists(results_paths):
-            with open(results_paths, "r") as f:
-                loaded_data = json.load(f)
+
+        save_results(results, "SMT", instance)
+
+
+        return
+
+    s = model["solver"]
+    max_dist = model["max_dist"]
+
+    if search == "bisection":
+        best_paths, best_max_dist, optimal, time = bisection(model, lb, ub, timelimit, num_couriers, num_items, courier_size, item_size, distances)
+
+        if best_paths is not None:
+            print("Max distance: ", best_max_dist, "Optimal: ", optimal)
+            results = {
+                solver_name: {
+                    "time": time,
+                    "optimal": optimal,
+                    "obj": best_max_dist,
+                    "sol": best_paths
+                }
+            }
         else:
-            loaded_data = dict()
-        
-        for key in results.keys():
-            loaded_data[key] = results[key]
-
-        # Creates JSON file with associated data
-        with open(results_paths, "w") as json_file:
-            json.dump(loaded_data, json_file, indent=4)
-        
-        
+            print("No solution found")
+            results = {
+                solver_name: {
+                    "time": time,
+                    "optimal": optimal,
+                    "obj": 0,
+                    "sol": "N/A"
+                }
+            }
+
+        save_results(results, "SMT", instance)
         return
-        
+
     # Define the objective function and solve
-    s.minimize(max_dist)
+    heuristic_paths = None
+    if strategy == "maxres":
+        # The solution of the constructive heuristic bounds max_dist, as in the bisection
+        routes, heuristic_obj = construct_solution(distances, num_couriers, num_items, courier_size, item_size)
+        if routes is not None and heuristic_obj <= ub:
+            print("Heuristic solution found, max distance: ", heuristic_obj)
+            heuristic_paths = [[node + 1 for node in route] for route in routes]
+            ub = heuristic_obj
+            s.add(max_dist <= ub)
+
+        # The core-guided engine works on soft constraints: max_dist - lb is written in binary and each bit set
+        # costs its weight, so that the cost of a solution is max_dist - lb with one soft constraint per bit
+        # instead of one per value of [lb, ub)
+        bits = [Bool(f"max_dist_bit_{i}") for i in range((ub - lb).bit_length())]
+        s.add(max_dist == lb + Sum([If(bit, 2 ** i, 0) for i, bit in enumerate(bits)] + [IntVal(0)]))
+        for i, bit in enumerate(bits):
+            s.add_soft(Not(bit), 2 ** i)
+    else:
+        s.minimize(max_dist)
 
     # Set the timeout
     s.set("timeout", timelimit*1000)
@@ -152,7 +161,7 @@ def main_smt(instance):
     start = timer()
     res = s.check()
     end = timer()
-   
+
     if res == sat:
         optimal = "true"
         print("The problem is satisfiable.")
@@ -164,39 +173,22 @@ def main_smt(instance):
         print("Timeout!")
 
     time = math.floor(end - start)
-    # Prepare directories 
-    if not os.path.exists("res"):
-        os.mkdir("res")
-    if not os.path.exists(os.path.join("res", "SMT")):
-        os.mkdir(os.path.join("res", "SMT"))
-        
-
-    model = s.model()
-    best_paths_dict = {}
-    for i in range(num_couriers):
-         for j in range(num_items + 1):
-            for k in range(num_items + 1):
-                if is_true(model.eval(visit[i][j][k])):
-                    best_paths_dict[(i, j)] = k
-    best_paths = [[] for i in range(num_couriers)]
-    for i in range(num_couriers):
-        k = num_items
-        while k != num_items or len(best_paths[i]) == 0:
-            if (i, k) in best_paths_dict.keys():
-                if best_paths_dict[(i, k)] != num_items:
-                    best_paths[i].append(best_paths_dict[(i, k)] + 1)
-                k = best_paths_dict[(i, k)]
-            else:
-                break
 
-    if res != unsat:
+    # After a timeout the optimizer may have no model at all
+    try:
+        solution = s.model()
+    except Z3Exception:
+        solution = None
+
+    if solution is not None and res != unsat:
+        best_paths = model["decode"](solution)
         if  optimal == "false":
             time = 300
         try:
-            best_max_dist = model.eval(max_dist).as_long()
+            best_max_dist = solution.eval(max_dist).as_long()
             print(best_max_dist)
             results = {
-                "Z3": {
+                solver_name: {
                     "time": time,
                     "optimal": optimal,
                     "obj": best_max_dist,
@@ -205,55 +197,542 @@ def main_smt(instance):
             }
         except AttributeError:
             results = {
-                "Z3": {
+                solver_name: {
                     "time": time,
                     "optimal": optimal,
                     "obj": 0,
                     "sol": "N/A"
                 }
             }
-                     
-        results_paths = f"res/SMT/inst{instance}.json"
-        
-        # Read existing data from the json
-        if os.path.exists(results_paths):
-            with open(results_paths, "r") as f:
-                loaded_data = json.load(f)
-        else:
-            loaded_data = dict()
-        
-        for key in results.keys():
-            loaded_data[key] = results[key]
-
-        # Creates JSON file with associated data
-        with open(results_paths, "w") as json_file:
-            json.dump(loaded_data, json_file, indent=4)
+
+        save_results(results, "SMT", instance)
+    elif heuristic_paths is not None:
+        # The heuristic solution is still the best one known
+        print("No solution found by the solver, keeping the heuristic one")
+        results = {
+                solver_name: {
+                    "time": 300,
+                    "optimal": "false",
+                    "obj": ub,
+                    "sol": heuristic_paths
+                }
+        }
+
+        save_results(results, "SMT", instance)
     else:
         time = 300
         print("No solution found")
         results = {
-                "Z3": {
+                solver_name: {
                     "time": time,
                     "optimal": optimal,
                     "obj": 0,
                     "sol": "N/A"
                 }
         }
-        
-        results_paths = f"res/SMT/inst{instance}.json"
-        
-        # Read existing data from the json
-        if os.path.exists(results_paths):
-            with open(results_paths, "r") as f:
-                loaded_data = json.load(f)
+
+        save_results(results, "SMT", instance)
+
+
+def smt_key(search="bisection", encoding="lia", formulation="three_index", strategy="default"):
+
+    # The results of the other searches, encodings, formulations and strategies are stored under their own key
+    key = "Z3" if search == "bisection" else f"Z3_{search}"
+    if encoding != "lia":
+        key += f"_{encoding}"
+    if formulation != "three_index":
+        key += f"_{formulation}"
+    if strategy != "default":
+        key += f"_{strategy}"
+
+    return key
+
+
+# Solvers of the strategies: the default ones, the core-guided optimizer (maxres) and, for the bisection,
+# the qflia tactic, a chain turning the 0-1 sums into cardinality constraints before the SMT core (card)
+# and the finite domain solver, which bit-blasts the bounded integers and runs the SAT solver (sat)
+SEARCHES = ("bisection", "optimize")
+
+STRATEGIES = ("default", "maxres", "qflia", "card", "sat")
+
+
+def make_solver(search, strategy="default"):
+
+    if search == "optimize":
+        s = Optimize()
+        if strategy == "maxres":
+            s.set("maxsat_engine", "maxres")
+        return s
+
+    if strategy == "qflia":
+        return Tactic("qflia").solver()
+    if strategy == "card":
+        return Then("simplify", "propagate-values", "lia2card", "smt").solver()
+    if strategy == "sat":
+        return SolverFor("QF_FD")
+
+    return Solver()
+
+
+def set_threads(threads):
+
+    # Parallel mode of z3, for both the SAT solver and the SMT core
+    if threads > 1:
+        set_param("parallel.enable", True)
+        set_param("parallel.threads.max", threads)
+        set_param("smt.threads", threads)
+
+    return None
+
+
+def build_smt_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub, search="bisection", encoding="lia", const_limit=180, strategy="default"):
+
+    # The z3 API takes Python integers, the instance comes as NumPy arrays
+    courier_size, item_size, distances = np.asarray(courier_size).tolist(), np.asarray(item_size).tolist(), np.asarray(distances).tolist()
+
+    # encoding "lia" writes the counting constraints as sums of If(b, 1, 0) over the integers,
+    # "pb" as pseudo-boolean constraints on the boolean variables
+    pb = encoding == "pb"
+
+    # Define variables
+    visit = [[[Bool(f"visit_{i}_{j}_{k}") for k in range(num_items + 1)] for j in range(num_items + 1)] for i in range(num_couriers)]
+    load = [[Bool(f"load_{i}_{j}") for j in range(num_items)] for i in range(num_couriers)]
+    u = [[Int(f"u{i}_{j}") for j in range(num_items+1)] for i in range(num_couriers)]
+
+    # Create solver instance: the bisection only needs satisfiability checks, so it uses a plain incremental solver
+    s = make_solver(search, strategy)
+
+    #----------constraints definition-------------
+    start_time = timer()
+
+    # Each item should be assigned to only one vehicle
+    for j in range(num_items):
+        if pb:
+            s.add(PbEq([(load[i][j], 1) for i in range(num_couriers)], 1))
         else:
-            loaded_data = dict()
-        
-        for key in results.keys():
-            loaded_data[key] = results[key]
+            s.add(Sum([If(load[i][j], 1, 0) for i in range(num_couriers)]) == 1)
+        if timer() - start_time > const_limit:
+            raise TimeoutError("Timeout reached while adding constraints")
+
+    for i in range(num_items):
+        if pb:
+            s.add(PbEq([(visit[k][i][j], 1) for k in range(num_couriers) for j in range(num_items + 1)], 1))
+        else:
+            s.add(Sum([If(visit[k][i][j], 1, 0) for k in range(num_couriers) for j in range(num_items + 1)]) == 1)
+        if timer() - start_time > const_limit:
+            raise TimeoutError("Timeout reached while adding constraints")
+
+    for i in range(num_items):
+        if pb:
+            s.add(PbEq([(visit[k][j][i], 1) for k in range(num_couriers) for j in range(num_items + 1)], 1))
+        else:
+            s.add(Sum([If(visit[k][j][i], 1, 0) for k in range(num_couriers) for j in range(num_items + 1)]) == 1)
+        if timer() - start_time > const_limit:
+            raise TimeoutError("Timeout reached while adding constraints")
+
+    for i in range(num_items):
+        for k in range(num_couriers):
+            if pb:
+                s.add(PbEq([(visit[k][i][j], 1) for j in range(num_items + 1)] + [(visit[k][j][i], -1) for j in range(num_items + 1)], 0))
+            else:
+                s.add(Sum([If(visit[k][i][j], 1,0) for j in range(num_items+1)]) == Sum([If(visit[k][j][i],1,0) for j in range(num_items + 1)]))
+            if timer() - start_time > const_limit:
+               raise TimeoutError("Timeout reached while adding constraints")
+
+    # Ensure consistent visits for each courier
+    for i in range(num_items):
+        for k in range(num_couriers):
+            if pb:
+                s.add(PbEq([(visit[k][i][j], 1) for j in range(num_items + 1)] + [(load[k][i], -1)], 0))
+            else:
+                s.add(Sum([If(visit[k][i][j],1,0) for j in range(num_items + 1)]) == load[k][i])
+            if timer() - start_time > const_limit:
+               raise TimeoutError("Timeout reached while adding constraints")
+
+    for i in range(num_items):
+        for k in range(num_couriers):
+            if pb:
+                s.add(PbEq([(visit[k][j][i], 1) for j in range(num_items + 1)] + [(load[k][i], -1)], 0))
+            else:
+                s.add(Sum([If(visit[k][j][i], 1,0) for j in range(num_items + 1)]) == load[k][i])
+            if timer() - start_time > const_limit:
+               raise TimeoutError("Timeout reached while adding constraints")
+
+    # MTZ constraint
+    for i in range(num_couriers):
+        for j in range(num_items + 1):
+            for k in range(num_items + 1):
+                if j != num_items and j != k:
+                    s.add(u[i][j] - u[i][k] + num_items * If(visit[i][j][k],1,0) <= num_items - 1)
+                    if timer() - start_time > const_limit:
+                        raise TimeoutError("Timeout reached while adding constraints")
+        # The orders can always be taken as the positions in the tour, bounding them lets the sat strategy bit-blast them
+        s.add([And(u[i][j] >= 0, u[i][j] <= num_items) for j in range(num_items + 1)])
+
+    # Capacity constraint
+    for i in range(num_couriers):
+        if pb:
+            s.add(PbLe([(load[i][j], item_size[j]) for j in range(num_items)], courier_size[i]))
+        else:
+            s.add(Sum([If(load[i][j], item_size[j], 0) for j in range(num_items)]) <= courier_size[i])
+        if timer() - start_time > const_limit:
+            raise TimeoutError("Timeout reached while adding constraints")
+
+    # Ensure no self-loop
+    for i in range(num_couriers):
+        if pb:
+            s.add(AtMost(*[visit[i][j][j] for j in range(num_items)], 0))
+        else:
+            s.add(Sum([If(visit[i][j][j], 1, 0) for j in range(num_items)]) == 0)
+        if timer() - start_time > const_limit:
+            raise TimeoutError("Timeout reached while adding constraints")
+
+    # Ensure each courier starts and ends at the depot exactly once
+    for k in range(num_couriers):
+        if pb:
+            s.add(PbEq([(visit[k][num_items][i], 1) for i in range(num_items)], 1))
+            s.add(PbEq([(visit[k][i][num_items], 1) for i in range(num_items)], 1))
+        else:
+            s.add(Sum([If(visit[k][num_items][i], 1, 0) for i in range(num_items)]) == 1)
+            s.add(Sum([If(visit[k][i][num_items], 1, 0) for i in range(num_items)]) == 1)
+        if timer() - start_time > const_limit:
+            raise TimeoutError("Timeout reached while adding constraints")
+
+    # Calculate the maximum distance traveled
+    max_dist = Int('max_dist')
+    s.add(max_dist >= lb, max_dist <= ub)
+    tours = [[(visit[i][j][k], distances[j][k]) for j in range(num_items + 1) for k in range(num_items + 1) if j != k] for i in range(num_couriers)]
+    for i in range(num_couriers):
+        if pb:
+            # The bound on the distance of each tour is a weighted pseudo-boolean constraint
+            s.add(PbLe(tours[i], ub))
+        # The optimizer needs max_dist as objective also with the pseudo-boolean encoding
+        if not pb or search == "optimize":
+            s.add(Sum([If(visit[i][j][k], distances[j][k], 0) for j in range(num_items + 1) for k in range(num_items + 1)]) <= max_dist)
+        if timer() - start_time > const_limit:
+            raise TimeoutError("Timeout reached while adding constraints")
+
+    # Constraint "max distance <= t", used by the bisection
+    if pb:
+        max_dist_le = lambda t: And([PbLe(tour, t) for tour in tours])
+    else:
+        max_dist_le = lambda t: max_dist <= t
+
+    return {
+        "solver": s,
+        "max_dist": max_dist,
+        "max_dist_le": max_dist_le,
+        "decode": lambda solution: decode_visit_routes(solution, num_couriers, num_items)
+    }
+
+
+def build_successor_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub, search="bisection", const_limit=180, strategy="default"):
+
+    # The z3 API takes Python integers, the instance comes as NumPy arrays
+    courier_size, item_size, distances = np.asarray(courier_size).tolist(), np.asarray(item_size).tolist(), np.asarray(distances).tolist()
+
+    # Same variables as the CP model: succ[i][j] is the node after j in the tour of courier i (j itself if the
+    # courier doesn't pass through j) and courier[j] is the courier carrying item j, so m * (n + 1) + n integers
+    # instead of m * (n + 1)^2 booleans. The depot is node num_items.
+    depot = num_items
+    succ = [[Int(f"succ_{i}_{j}") for j in range(num_items + 1)] for i in range(num_couriers)]
+    courier = [Int(f"courier_{j}") for j in range(num_items)]
+
+    # Lookup tables shared by all the couriers: the distance between two nodes and the position of an item in its tour
+    dist = Function("dist", IntSort(), IntSort(), IntSort())
+    order = Function("order", IntSort(), IntSort())
+
+    s = make_solver(search, strategy)
+
+    #----------constraints definition-------------
+    start_time = timer()
+
+    for j in range(num_items + 1):
+        s.add([dist(j, k) == distances[j][k] for k in range(num_items + 1)])
+        if timer() - start_time > const_limit:
+            raise TimeoutError("Timeout reached while adding constraints")
+
+    for j in range(num_items):
+        s.add(courier[j] >= 0, courier[j] < num_couriers)
+        s.add(order(j) >= 1, order(j) <= num_items)
+
+    for i in range(num_couriers):
+        s.add([And(succ[i][j] >= 0, succ[i][j] <= depot) for j in range(num_items + 1)])
+
+        # The successors of a courier are a permutation of the nodes
+        s.add(Distinct(succ[i]))
+
+        # Each courier leaves the depot, i.e. delivers at least one item
+        s.add(succ[i][depot] != depot)
+
+        for j in range(num_items):
+            # Item j is carried by courier i if and only if the tour of courier i passes through it
+            s.add((succ[i][j] != j) == (courier[j] == i))
+
+            # Subtour elimination: the items of a tour come in increasing order
+            s.add(Implies(And(succ[i][j] != j, succ[i][j] != depot), order(j) < order(succ[i][j])))
+
+        if timer() - start_time > const_limit:
+            raise TimeoutError("Timeout reached while adding constraints")
+
+    # Capacity constraint
+    for i in range(num_couriers):
+        s.add(Sum([If(courier[j] == i, item_size[j], 0) for j in range(num_items)]) <= courier_size[i])
+        if timer() - start_time > const_limit:
+            raise TimeoutError("Timeout reached while adding constraints")
+
+    # Calculate the maximum distance traveled, looking up the length of each arc of the tour
+    max_dist = Int('max_dist')
+    s.add(max_dist >= lb, max_dist <= ub)
+    for i in range(num_couriers):
+        s.add(Sum([dist(j, succ[i][j]) for j in range(num_items + 1)]) <= max_dist)
+        if timer() - start_time > const_limit:
+            raise TimeoutError("Timeout reached while adding constraints")
+
+    return {
+        "solver": s,
+        "max_dist": max_dist,
+        "max_dist_le": lambda t: max_dist <= t,
+        "decode": lambda solution: decode_successor_routes(solution, num_couriers, num_items)
+    }
+
+
+def smt2_lines(num_couriers, num_items, courier_size, item_size, distances, lb, ub, encoding="lia"):
+
+    # Same model as build_smt_model, written as SMT-LIB2 text one line at a time
+    pb = encoding == "pb"
+    nodes = range(num_items + 1)
+    visit = lambda i, j, k: f"visit_{i}_{j}_{k}"
+    load = lambda i, j: f"load_{i}_{j}"
+
+    def count(literals):
+        return "(+ " + " ".join(f"(ite {x} 1 0)" for x in literals) + ")"
+
+    def pb_eq(terms, value):
+        return f"((_ pbeq {value} {' '.join(str(c) for _, c in terms)}) {' '.join(x for x, _ in terms)})"
+
+    yield "(set-logic ALL)"
+    for i in range(num_couriers):
+        for j in nodes:
+            for k in nodes:
+                yield f"(declare-const {visit(i, j, k)} Bool)"
+        for j in range(num_items):
+            yield f"(declare-const {load(i, j)} Bool)"
+        for j in nodes:
+            yield f"(declare-const u{i}_{j} Int)"
+    yield "(declare-const max_dist Int)"
+
+    # Each item should be assigned to only one vehicle
+    for j in range(num_items):
+        if pb:
+            yield f"(assert {pb_eq([(load(i, j), 1) for i in range(num_couriers)], 1)})"
+        else:
+            yield f"(assert (= {count(load(i, j) for i in range(num_couriers))} 1))"
+
+    # Each item is left once and reached once
+    for i in range(num_items):
+        if pb:
+            yield f"(assert {pb_eq([(visit(k, i, j), 1) for k in range(num_couriers) for j in nodes], 1)})"
+            yield f"(assert {pb_eq([(visit(k, j, i), 1) for k in range(num_couriers) for j in nodes], 1)})"
+        else:
+            yield f"(assert (= {count(visit(k, i, j) for k in range(num_couriers) for j in nodes)} 1))"
+            yield f"(assert (= {count(visit(k, j, i) for k in range(num_couriers) for j in nodes)} 1))"
+
+    # A courier leaves each item it reaches, if and only if it carries it
+    for i in range(num_items):
+        for k in range(num_couriers):
+            if pb:
+                yield f"(assert {pb_eq([(visit(k, i, j), 1) for j in nodes] + [(visit(k, j, i), -1) for j in nodes], 0)})"
+                yield f"(assert {pb_eq([(visit(k, i, j), 1) for j in nodes] + [(load(k, i), -1)], 0)})"
+                yield f"(assert {pb_eq([(visit(k, j, i), 1) for j in nodes] + [(load(k, i), -1)], 0)})"
+            else:
+                yield f"(assert (= {count(visit(k, i, j) for j in nodes)} {count(visit(k, j, i) for j in nodes)}))"
+                yield f"(assert (= {count(visit(k, i, j) for j in nodes)} (ite {load(k, i)} 1 0)))"
+                yield f"(assert (= {count(visit(k, j, i) for j in nodes)} (ite {load(k, i)} 1 0)))"
+
+    # MTZ constraint
+    for i in range(num_couriers):
+        for j in range(num_items):
+            for k in nodes:
+                if j != k:
+                    yield f"(assert (<= (+ u{i}_{j} (- u{i}_{k}) (ite {visit(i, j, k)} {num_items} 0)) {num_items - 1}))"
+        for j in nodes:
+            yield f"(assert (and (>= u{i}_{j} 0) (<= u{i}_{j} {num_items})))"
+
+    # Capacity constraint
+    for i in range(num_couriers):
+        if pb:
+            yield f"(assert ((_ pble {courier_size[i]} {' '.join(str(size) for size in item_size)}) {' '.join(load(i, j) for j in range(num_items))}))"
+        else:
+            yield f"(assert (<= (+ {' '.join(f'(ite {load(i, j)} {item_size[j]} 0)' for j in range(num_items))}) {courier_size[i]}))"
+
+    # Ensure no self-loop, each courier starts and ends at the depot exactly once
+    for k in range(num_couriers):
+        yield "(assert (and " + " ".join(f"(not {visit(k, j, j)})" for j in range(num_items)) + "))"
+        if pb:
+            yield f"(assert {pb_eq([(visit(k, num_items, i), 1) for i in range(num_items)], 1)})"
+            yield f"(assert {pb_eq([(visit(k, i, num_items), 1) for i in range(num_items)], 1)})"
+        else:
+            yield f"(assert (= {count(visit(k, num_items, i) for i in range(num_items))} 1))"
+            yield f"(assert (= {count(visit(k, i, num_items) for i in range(num_items))} 1))"
+
+    # Calculate the maximum distance traveled. In text the bound of a pseudo-boolean constraint can't change
+    # from one probe to the next, so the probes go through max_dist with both encodings.
+    yield f"(assert (and (>= max_dist {lb}) (<= max_dist {ub})))"
+    for i in range(num_couriers):
+        arcs = [(visit(i, j, k), distances[j][k]) for j in nodes for k in nodes if j != k]
+        if pb:
+            yield f"(assert ((_ pble {ub} {' '.join(str(d) for _, d in arcs)}) {' '.join(x for x, _ in arcs)}))"
+        yield f"(assert (<= (+ {' '.join(f'(ite {x} {d} 0)' for x, d in arcs)}) max_dist))"
+
+
+def build_smt2_model(num_couriers, num_items, courier_size, item_size, distances, lb, ub, search="bisection", encoding="lia", dump_path=None, strategy="default", const_limit=180, size_limit=SMT2_SIZE_LIMIT):
+
+    # The text is generated line by line and written to dump_path (or to a temporary file), it is never held
+    # whole in memory, then parsed by z3 in a single call. Beyond the time or the size limit the formula is
+    # dropped, as z3 would need several GB to parse it.
+    path = dump_path if dump_path is not None else temp_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    start_time = timer()
+    size = 0
+    try:
+        with open(path, "w") as file:
+            for line in smt2_lines(num_couriers, num_items, courier_size, item_size, distances, lb, ub, encoding):
+                file.write(line + "\n")
+                size += len(line) + 1
+                if size > size_limit * 1024 * 1024:
+                    raise TimeoutError(f"Formula larger than {size_limit} MB")
+                if timer() - start_time > const_limit:
+                    raise TimeoutError("Timeout reached while adding constraints")
+
+        model = load_smt_model(path, search, "three_index", num_couriers, num_items, strategy)
+    except TimeoutError:
+        os.remove(path)
+        raise
+
+    if dump_path is None:
+        os.remove(path)
+
+    return model
+
+
+def smt_model(s, formulation, num_couriers, num_items):
+
+    # The variables are found by name, so that the model can come from a file
+    max_dist = Int("max_dist")
+    decode = decode_successor_routes if formulation == "successor" else decode_visit_routes
+
+    return {
+        "solver": s,
+        "max_dist": max_dist,
+        "max_dist_le": lambda t: max_dist <= t,
+        "decode": lambda solution: decode(solution, num_couriers, num_items)
+    }
+
+
+def load_smt_model(path, search, formulation, num_couriers, num_items, strategy="default"):
+
+    s = make_solver(search, strategy)
+    s.from_file(path)
+
+    return smt_model(s, formulation, num_couriers, num_items)
+
+
+def cache_formula(file_name, cache_key, model, build_time, source_path=None, keep_source=False):
+
+    # The formula is the text it was parsed from, or the assertions of the solver written back as SMT-LIB2
+    if source_path is None:
+        source_path = temp_path()
+        with open(source_path, "w") as file:
+            file.write(model["solver"].sexpr())
+    elif keep_source:
+        path = temp_path()
+        shutil.copyfile(source_path, path)
+        source_path = path
+
+    path = store(file_name, cache_key, source_path, build_time)
+    print(f"Formula saved in the cache as {path}")
+
+    return None
+
+
+def decode_visit_routes(solution, num_couriers, num_items):
+
+    # The model is read as text in a single call and only the true visit variables are kept
+    successors = np.full((num_couriers, num_items + 1), -1)
+    for i, j, k in re.findall(r"\(define-fun visit_(\d+)_(\d+)_(\d+) \(\) Bool\s+true\)", solution.sexpr()):
+        successors[int(i), int(j)] = int(k)
+
+    return routes_from_successors(successors)
+
+
+def decode_successor_routes(solution, num_couriers, num_items):
+
+    successors = np.full((num_couriers, num_items + 1), -1)
+    for i, j, k in re.findall(r"\(define-fun succ_(\d+)_(\d+) \(\) Int\s+(\d+)\)", solution.sexpr()):
+        successors[int(i), int(j)] = int(k)
+
+    return routes_from_successors(successors)
+
+
+def bisection(model, lb, ub, timelimit, num_couriers, num_items, courier_size, item_size, distances):
+
+    s = model["solver"]
+    max_dist_le = model["max_dist_le"]
+
+    # Binary search on max_dist: each probe checks max_dist <= t under an assumption literal,
+    # so the solver keeps its learned clauses from one probe to the next
+    start = timer()
+    best_paths, best_max_dist = None, None
+    low, high = lb, ub
+
+    # The solution of the constructive heuristic is the first one, only better ones are searched
+    routes, heuristic_obj = construct_solution(distances, num_couriers, num_items, courier_size, item_size)
+    if routes is not None and heuristic_obj <= ub:
+        print("Heuristic solution found, max distance: ", heuristic_obj)
+        best_paths = [[node + 1 for node in route] for route in routes]
+        best_max_dist = heuristic_obj
+        high = heuristic_obj - 1
+        s.add(max_dist_le(high))
+
+    while low <= high:
+        remaining = timelimit - (timer() - start)
+        if remaining <= 0:
+            break
+        s.set("timeout", max(int(remaining * 1000), 1))
+
+        # The first probe looks for any solution, the next ones halve the interval
+        threshold = high if best_paths is None else (low + high) // 2
+        probe = Bool(f"max_dist_le_{threshold}")
+        s.add(Implies(probe, max_dist_le(threshold)))
+        res = s.check(probe)
+
+        if res == sat:
+            solution = s.model()
+            best_paths = model["decode"](solution)
+            # The tours can be shorter than the value of max_dist in the model
+            best_max_dist = max(int(sum(distances[j][k] for j, k in zip([num_items] + [node - 1 for node in path], [node - 1 for node in path] + [num_items])))
+                                for path in best_paths)
+            print(f"Solution found with max distance {best_max_dist}, searching in [{low}, {best_max_dist - 1}]")
+            high = best_max_dist - 1
+            # Only better solutions are of interest from now on
+            s.add(max_dist_le(high))
+        elif res == unsat:
+            print(f"No solution with max distance <= {threshold}")
+            if best_paths is None:
+                break
+            low = threshold + 1
+            s.add(Not(max_dist_le(threshold)))
+        else:
+            # Timeout (or interrupt): keep the best solution found so far
+            print("Timeout!")
+            break
+
+    end = timer()
 
-        # Creates JSON file with the data
-        with open(results_paths, "w") as json_file:
-            json.dump(loaded_data, json_file, indent=4)
+    # The search is complete when the interval is empty
+    optimal = "true" if best_paths is not None and low > high else "false"
+    time = math.floor(end - start) if optimal == "true" else 300
 
-        
\ No newline at end of file
+    return best_paths, best_max_dist, optimal, time
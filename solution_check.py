@@ -2,6 +2,7 @@ import os
 import re
 import sys
 import json
+from instance_cache import load_instance
 
 TIMEOUT = 300
 # OPT[i] = Optimal value for instance i. 
@@ -46,25 +47,8 @@ def main(args):
         inst_number = '0' + inst_number
       inst_path = args[1] + '/inst' + inst_number + '.dat'
       print(f'\tLoading input instance {inst_path}')
-      with open(inst_path) as inst_file:
-        i = 0        
-        for line in inst_file:
-          if i == 0:
-            n_couriers = int(line)
-          elif i == 1:
-            n_items = int(line)
-            dist_matrix = [None] * (n_items + 1)
-          elif i == 2:
-            capacity = [int(x) for x in line.split()]
-            assert len(capacity) == n_couriers
-          elif i == 3:
-            sizes = [int(x) for x in line.split()]
-            assert len(sizes) == n_items
-          else:
-            row = [int(x) for x in line.split()]
-            assert len(row) == n_items + 1
-            dist_matrix[i-4] = [int(x) for x in row]
-          i += 1
+      n_couriers, n_items, capacity, sizes, dist_matrix = load_instance(inst_path)
+      assert dist_matrix.shape == (n_items + 1, n_items + 1)
       for i in range(len(dist_matrix)):
         assert dist_matrix[i][i] == 0
       for solver, result in results.items():
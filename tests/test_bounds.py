@@ -0,0 +1,33 @@
+import numpy as np
+from bounds import implied_data
+
+
+# Three items and the depot (node 3)
+DISTANCES = np.array([
+    [0, 3, 4, 5],
+    [3, 0, 2, 6],
+    [4, 2, 0, 7],
+    [5, 6, 7, 0]
+])
+
+
+def test_implied_data_with_undersized_courier():
+
+    # The second courier is smaller than every item
+    implied = implied_data(DISTANCES, 2, 3, [10, 1], [2, 3, 4])
+
+    assert implied["eligible"] == [[1, 2, 3], []]
+    assert implied["max_items"][1] == 0
+    assert implied["courier_lb"][1] == 0
+    # The first courier leaves the depot and the three items through their cheapest arcs
+    assert implied["courier_lb"][0] == 5 + 3 + 2 + 2
+
+
+def test_implied_data_courier_bounds():
+
+    implied = implied_data(DISTANCES, 2, 3, [10, 10], [2, 3, 4])
+
+    assert implied["eligible"] == [[1, 2, 3], [1, 2, 3]]
+    assert implied["min_out"] == [3, 2, 2, 5]
+    # The round trip to the closest item
+    assert implied["courier_lb"] == [10, 10]
@@ -0,0 +1,65 @@
+import os
+import signal
+from runner import make_job, start_job, collect_job
+from utils import save_results, load_result
+
+
+INCUMBENT = {"time": 300, "optimal": "false", "obj": 14, "sol": [[1, 2, 3], [4, 5, 6]]}
+
+
+def stream_and_die(instance):
+
+    # A CP run that has streamed one solution and is then killed (e.g. by the memory cap)
+    save_results({"gecode_fail_rand_luby": INCUMBENT}, "CP", instance)
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def die(instance):
+
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def crash(instance):
+
+    raise RuntimeError("solver crashed")
+
+
+def test_killed_worker_keeps_streamed_incumbent(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    job = make_job("gecode inst01", stream_and_die, ("01",), "CP", "01", "gecode_fail_rand_luby")
+
+    process, conn = start_job(job, log_dir=None)
+    result = collect_job(job, process, conn)
+
+    assert process.exitcode == -signal.SIGKILL
+    assert result == INCUMBENT
+    assert load_result("CP", "01", "gecode_fail_rand_luby") == INCUMBENT
+
+
+def test_killed_worker_without_solution_is_recorded_unsolved(tmp_path, monkeypatch):
+
+    monkeypatch.chdir(tmp_path)
+    job = make_job("gecode inst01", die, ("01",), "CP", "01", "gecode_fail_rand_luby")
+
+    process, conn = start_job(job, log_dir=None)
+    result = collect_job(job, process, conn)
+
+    assert result["sol"] == "N/A"
+    assert load_result("CP", "01", "gecode_fail_rand_luby") == result
+
+
+def test_crashed_worker_ignores_previous_result(tmp_path, monkeypatch):
+
+    # An optimal entry left by an earlier run must not be taken for the result of the crashed job
+    monkeypatch.chdir(tmp_path)
+    save_results({"gecode_fail_rand_luby": dict(INCUMBENT, optimal="true")}, "CP", "01")
+    job = make_job("gecode inst01", crash, ("01",), "CP", "01", "gecode_fail_rand_luby")
+
+    process, conn = start_job(job, log_dir=None)
+    result = collect_job(job, process, conn)
+
+    assert process.exitcode != 0
+    assert result["sol"] == "N/A"
+    assert result["optimal"] == "false"
+    assert load_result("CP", "01", "gecode_fail_rand_luby") == result
@@ -1,6 +1,11 @@
 import os
 import json
 import glob
+import fcntl
+import numpy as np
+from instance_cache import load_instance
+from bounds import compute_bounds, implied_data
+from heuristic import construct_solution
 
 
 def create_dzn(path):
@@ -41,27 +46,69 @@ def create_dzn(path):
 
     return None
 
-def insert_bounds_to_file(filename, lb, ub):
+def cp_heuristic(instance_num):
     
-    with open(filename, 'a+') as dzn_file:
-        dzn_file.seek(0)
-        
-        # Read the content of the file
-        content = dzn_file.read()
-        
-        if "lb" not in content: 
-            dzn_file.write(f"lb = {lb};\n")
-            
-        if "ub" not in content:        
-            dzn_file.write(f"ub = {ub};\n")
+    # Solution of the constructive heuristic to warm start the CP models: the routes (1-based items, as the
+    # ones of output_to_routes) and their max distance. None when a courier is left without items, since
+    # the models don't allow it and its objective wouldn't be an upper bound for them
+    num_couriers, num_items, courier_size, item_size, distances = import_arrays(f"Instances/inst{instance_num}.dat")
+    routes, obj = construct_solution(distances, num_couriers, num_items, courier_size, item_size)
+    
+    if routes is None or any(len(route) == 0 for route in routes):
+        return None
+    
+    return [[item + 1 for item in route] for route in routes], obj
+
+
+def cp_data(instance_num, heuristic=None):
+    
+    # Data of a CP run as dzn text, from the cached instance and with the current bounds, so that
+    # the files in cp/Instances are never written and concurrent runs don't share anything
+    num_couriers, num_items, courier_size, item_size, distances = import_arrays(f"Instances/inst{instance_num}.dat")
+    lb, ub = computeBounds(distances, num_couriers, num_items, courier_size, item_size)
+    
+    # The heuristic solution (see cp_heuristic) is the warm start of cp/models/warm_start.mzn, and its objective
+    # the upper bound, which also helps the solvers that ignore the warm start annotations
+    warm_succ, warm_assignment = [], []
+    if heuristic is not None:
+        routes, obj = heuristic
+        ub = min(ub, obj)
+        warm_succ = [node for succ in successors_from_routes(routes, num_items) for node in succ]
+        warm_assignment = [0] * num_items
+        for k, route in enumerate(routes):
+            for item in route:
+                warm_assignment[item - 1] = k + 1
+    
+    rows = "\n     | ".join(", ".join(str(d) for d in row) for row in distances)
+    
+    # Redundant data for the implied constraints of cp/models/implied.mzn
+    implied = implied_data(distances, num_couriers, num_items, courier_size, item_size)
+    
+    return "\n".join([
+        f"num_couriers = {num_couriers};",
+        f"num_items = {num_items};",
+        f"courier_size = [{', '.join(str(c) for c in courier_size)}];",
+        f"item_size = [{', '.join(str(s) for s in item_size)}];",
+        f"distances = [| {rows}|];",
+        f"lb = {lb};",
+        f"ub = {ub};",
+        f"min_out = {implied['min_out']};",
+        f"min_in = {implied['min_in']};",
+        f"eligible = [{', '.join('{' + ', '.join(str(j) for j in items) + '}' for items in implied['eligible'])}];",
+        f"max_items = {implied['max_items']};",
+        f"min_items = {implied['min_items']};",
+        f"courier_lb = {implied['courier_lb']};",
+        f"warm_succ = {warm_succ};",
+        f"warm_assignment = {warm_assignment};"
+    ]) + "\n"
 
 
 def output_to_routes(output):
     
     succ = output['succ']
-    u = output['u']
 
-    num_items = len(u)
+    # The depot is the last node
+    num_items = len(succ[0]) - 1
     num_couriers = len(succ) 
 
     routes = []
@@ -85,6 +132,47 @@ def output_to_routes(output):
     return routes
 
 
+def routes_from_successors(successors):
+
+    # successors[i][j] is the node after j in the tour of courier i (0-based, the depot is the last node),
+    # -1 or j itself if courier i doesn't leave j
+    routes = []
+    for succ in np.asarray(successors).tolist():
+        depot = len(succ) - 1
+        route = []
+        node = succ[depot]
+        # A tour has at most one visit per item, this also stops on a malformed solution
+        while node != depot and node >= 0 and len(route) < depot:
+            route.append(node + 1)
+            node = succ[node]
+        routes.append(route)
+
+    return routes
+
+
+def successors_from_routes(routes, num_items):
+
+    # Inverse of output_to_routes: succ of the CP models (1-based, the depot is num_items + 1) from the routes,
+    # the items a courier doesn't carry are their own successor
+    successors = []
+    for route in routes:
+        succ = list(range(1, num_items + 2))
+        for node, next_node in zip([num_items + 1] + route, route + [num_items + 1]):
+            succ[node - 1] = next_node
+        successors.append(succ)
+
+    return successors
+
+
+def routes_from_arcs(arcs):
+
+    # arcs[i][j][k] is the value of the arc from node j to node k for courier i, read from the solver in bulk
+    arcs = np.asarray(arcs) > 0.5
+    successors = np.where(arcs.any(axis=2), arcs.argmax(axis=2), -1)
+
+    return routes_from_successors(successors)
+
+
 def routes_to_json(routes, time, instance, output_dict, model_type, solver):
     
     if output_dict != None:  
@@ -114,74 +202,69 @@ def routes_to_json(routes, time, instance, output_dict, model_type, solver):
             }
         }
     
-    if not os.path.exists("res"):
-        os.mkdir("res")
-    if not os.path.exists(os.path.join("res", "CP")):
-        os.mkdir(os.path.join("res", "CP"))
+    save_results(results, "CP", instance)
+    
+    return None
+
+
+def save_results(results, approach, instance, folder="res"):
+    
+    # Prepare directories if they don't exist yet
+    os.makedirs(os.path.join(folder, approach), exist_ok=True)
         
-    results_paths = f"res/CP/inst{instance}.json"
+    results_paths = f"{folder}/{approach}/inst{instance}.json"
     
-    # Read existing data from the json
-    if os.path.exists(results_paths):
-        with open(results_paths, "r") as f:
-            loaded_data = json.load(f)
-    else:
-        loaded_data = dict()
+    with open(results_paths, "a+") as json_file:
+        # Lock the file so that jobs running in parallel on the same instance don't overwrite each other
+        fcntl.flock(json_file, fcntl.LOCK_EX)
         
-    for key in results.keys():
-        loaded_data[key] = results[key]
+        # Read existing data from the json
+        json_file.seek(0)
+        content = json_file.read()
+        if content:
+            loaded_data = json.loads(content)
+        else:
+            loaded_data = dict()
+            
+        for key in results.keys():
+            loaded_data[key] = results[key]
 
-    # Creates JSON file with associated data
-    with open(results_paths, "w") as json_file:
+        # Rewrite the JSON file with associated data
+        json_file.seek(0)
+        json_file.truncate()
         json.dump(loaded_data, json_file, indent=4)
     
     return None
 
 
-def import_data(filename):
+def load_result(approach, instance, key):
     
-    with open(filename, 'r') as file:
-        data = file.read().strip().splitlines()
-
-        # Assign the first line to the Couriers
-        num_couriers = int(data[0])
+    results_paths = f"res/{approach}/inst{instance}.json"
+    
+    if not os.path.exists(results_paths):
+        return None
+    
+    with open(results_paths, "r") as json_file:
+        fcntl.flock(json_file, fcntl.LOCK_SH)
+        loaded_data = json.load(json_file)
         
-        # Assign the second line to the items
-        num_items = int(data[1])
-
-        # Assign the third line to the Couriers' maximum load
-        courier_size = [int(x) for x in data[2].split()]
-
-        # Assign the fourth line to the item size
-        item_size = [int(x) for x in data[3].split()]
-
-        # Assign the remaining lines to the Distances between locations
-        distances = []
-        for line in data[4:]:
-            distances.append([int(x) for x in line.split()])
-
-    return num_couriers, num_items, courier_size, item_size, distances
+    return loaded_data.get(key)
 
 
-def lower_bound(distances, num_items):
-    for i in range(num_items):
-        simple_path = [distances[num_items][i] + distances[i][num_items]]
-    lb = max(simple_path)
-
-    return lb
-
-
-def upper_bound(distances, num_couriers, num_items):
-    max_item_per_courier = num_items-num_couriers+1
-    from_depot = max([distances[num_items][i] for i in range(num_items)]) 
-    to_depot = max([distances[i][num_items] for i in range(num_items)]) 
+def import_arrays(filename):
+    
+    # Read the instance from the binary cache, the text is parsed only the first time: the sizes are NumPy
+    # arrays and the distance matrix is memory-mapped, no copy is made
+    return load_instance(filename)
 
-    between_items = [max(distances[j][i] for j in range(num_items) if i!=j) for i in range(num_items)]
-    between_items.sort(reverse=True)
 
-    return sum(between_items[:max_item_per_courier-1]) + from_depot + to_depot
+def import_data(filename):
+    
+    # Same as import_arrays with Python lists, for the solver APIs that need them
+    num_couriers, num_items, courier_size, item_size, distances = import_arrays(filename)
 
+    return num_couriers, num_items, courier_size.tolist(), item_size.tolist(), distances.tolist()
 
-def computeBounds(distances, num_couriers, num_items):
-    return lower_bound(distances, num_items), upper_bound(distances, num_couriers, num_items)
 
+def computeBounds(distances, num_couriers, num_items, courier_size, item_size):
+    return compute_bounds(distances, num_couriers, num_items, courier_size, item_size)